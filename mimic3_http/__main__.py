@@ -18,12 +18,12 @@ import asyncio
 import logging
 import tempfile
 import threading
-from queue import Queue
+from queue import SimpleQueue
 
 import hypercorn
 
 from .app import get_app
-from .args import get_args
+from .args import SynthesisConfig, get_args
 from .synthesis import do_synthesis_proc
 
 _LOGGER = logging.getLogger(__name__)
@@ -50,10 +50,16 @@ def main(argv=None):
 
     # Run Web Server
     _LOGGER.info("Starting web server")
-    request_queue = Queue()
+
+    # All synthesis threads share one queue, so an idle thread picks up the
+    # next request instead of waiting behind a long synthesis.
+    request_queue: SimpleQueue = SimpleQueue()
+    synthesis_config = SynthesisConfig.from_args(args)
     threads = [
         threading.Thread(
-            target=do_synthesis_proc, args=(args, request_queue), daemon=True
+            target=do_synthesis_proc,
+            args=(synthesis_config, request_queue),
+            daemon=True,
         )
         for _ in range(args.num_threads)
     ]
@@ -70,10 +76,10 @@ def main(argv=None):
     finally:
         # Drain queue
         while not request_queue.empty():
-            request_queue.get()
+            request_queue.get_nowait()
 
         # Stop request threads
-        for _ in range(args.num_threads):
+        for _ in threads:
             request_queue.put(None)
 
         for thread in threads:
@@ -18,12 +18,14 @@ import asyncio
 import dataclasses
 import json
 import logging
+import os
 import re
 import shlex
 import subprocess
 import typing
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from queue import Queue
+from queue import SimpleQueue
 from urllib.parse import parse_qs
 from uuid import uuid4
 
@@ -44,12 +46,61 @@ from mimic3_tts.utils import LANG_NAMES, SAMPLE_SENTENCES
 
 from ._resources import _DIR, _PACKAGE
 from .args import _MISSING
-from .const import SynthesisRequest, TextToWavParams
+from .const import SynthesisRequest, SynthesisResult, TextToWavParams
 
 _LOGGER = logging.getLogger(__name__)
 
+_WHITESPACE_PATTERN = re.compile(r"\s+")
 
-def get_app(args: argparse.Namespace, request_queue: Queue, temp_dir: str):
+
+def get_cache_path(cache_dir: Path, cache_key: str) -> Path:
+    """Get path to cached WAV file.
+
+    Files are split into sub-directories by the first two characters of their
+    key to avoid very large directories.
+    """
+    return cache_dir / cache_key[:2] / f"{cache_key}.wav"
+
+
+def read_cached_wav(cache_dir: Path, cache_key: str) -> typing.Optional[bytes]:
+    """Read WAV file from cache, or return None if it doesn't exist"""
+    wav_path = get_cache_path(cache_dir, cache_key)
+
+    try:
+        wav_bytes = wav_path.read_bytes()
+        _LOGGER.debug("Loaded WAV from cache: %s", wav_path)
+        return wav_bytes
+    except FileNotFoundError:
+        return None
+
+
+def write_cached_wav(
+    cache_dir: Path, cache_key: str, wav_chunks: typing.Iterable[bytes]
+):
+    """Write WAV file to cache"""
+    wav_path = get_cache_path(cache_dir, cache_key)
+
+    try:
+        wav_path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Write to a temporary file first, so a partially written WAV file
+        # is never read from the cache.
+        temp_wav_path = wav_path.with_name(f"{wav_path.name}.{uuid4().hex}.tmp")
+        with open(temp_wav_path, "wb") as temp_wav_file:
+            temp_wav_file.writelines(wav_chunks)
+
+        os.replace(temp_wav_path, wav_path)
+
+        _LOGGER.debug("Cached WAV at %s", wav_path.absolute())
+    except Exception:
+        _LOGGER.exception("Error writing WAV to cache: %s", wav_path)
+
+
+def get_app(
+    args: argparse.Namespace,
+    request_queue: SimpleQueue,
+    temp_dir: str,
+):
     """Create and return Quart application for Mimic 3 HTTP server"""
 
     _TEMP_DIR: typing.Optional[Path] = None
@@ -70,10 +121,20 @@ def get_app(args: argparse.Namespace, request_queue: Queue, temp_dir: str):
     if _TEMP_DIR:
         _LOGGER.debug("Cache directory: %s", _TEMP_DIR)
 
-    async def text_to_wav(params: TextToWavParams, no_cache: bool = False) -> bytes:
+    # Cache files are read/written here instead of on the event loop
+    _CACHE_EXECUTOR = ThreadPoolExecutor(
+        max_workers=2, thread_name_prefix="mimic3_cache"
+    )
+
+    # Futures of requests currently being synthesized (key: cache key)
+    _IN_FLIGHT: typing.Dict[str, asyncio.Future] = {}
+
+    async def text_to_wav(
+        params: TextToWavParams, no_cache: bool = False
+    ) -> typing.List[bytes]:
         """Synthesize text into audio.
 
-        Returns: WAV bytes
+        Returns: WAV chunks (header first, then audio)
         """
         if args.deterministic:
             # Disable noise
@@ -83,34 +144,58 @@ def get_app(args: argparse.Namespace, request_queue: Queue, temp_dir: str):
 
         _LOGGER.debug(params)
 
+        cache_key = params.cache_key
+        loop = asyncio.get_running_loop()
+
         if _TEMP_DIR and (not no_cache):
             # Look up in cache
-            maybe_wav_path = _TEMP_DIR / f"{params.cache_key}.wav"
-            if maybe_wav_path.is_file():
-                _LOGGER.debug("Loading WAV from cache: %s", maybe_wav_path)
-                wav_bytes = maybe_wav_path.read_bytes()
-                return wav_bytes
+            maybe_wav_bytes = await loop.run_in_executor(
+                _CACHE_EXECUTOR, read_cached_wav, _TEMP_DIR, cache_key
+            )
+            if maybe_wav_bytes is not None:
+                return [maybe_wav_bytes]
+
+        in_flight_future = _IN_FLIGHT.get(cache_key)
+        if in_flight_future is not None:
+            # Identical request is already being synthesized
+            _LOGGER.debug("Waiting on in-flight request: %s", cache_key)
+            in_flight_result: SynthesisResult = await asyncio.shield(in_flight_future)
+            return in_flight_result.wav_chunks
 
-        loop = asyncio.get_running_loop()
         future = loop.create_future()
-        request_queue.put_nowait(
-            SynthesisRequest(
-                params=params,
-                loop=loop,
-                future=future,
+        _IN_FLIGHT[cache_key] = future
+
+        try:
+            request_queue.put_nowait(
+                SynthesisRequest(
+                    params=params,
+                    loop=loop,
+                    future=future,
+                )
             )
-        )
-        wav_bytes = await future
+
+            # Shielded so a cancelled client doesn't cancel the shared future
+            result: SynthesisResult = await asyncio.shield(future)
+        finally:
+            _IN_FLIGHT.pop(cache_key, None)
+
+        wav_chunks = result.wav_chunks
 
         if _TEMP_DIR and (not no_cache):
-            # Store in cache
-            wav_path = _TEMP_DIR / f"{params.cache_key}.wav"
-            wav_path.parent.mkdir(parents=True, exist_ok=True)
-            wav_path.write_bytes(wav_bytes)
+            # Store in cache without waiting
+            loop.run_in_executor(
+                _CACHE_EXECUTOR, write_cached_wav, _TEMP_DIR, cache_key, wav_chunks
+            )
 
-            _LOGGER.debug("Cached WAV at %s", wav_path.absolute())
+        return wav_chunks
 
-        return wav_bytes
+    def wav_response(wav_chunks: typing.List[bytes]) -> Response:
+        """Send WAV chunks to the client without joining them"""
+        return Response(
+            wav_chunks,
+            mimetype="audio/wav",
+            headers={"Content-Length": str(sum(len(chunk) for chunk in wav_chunks))},
+        )
 
     # -----------------------------------------------------------------------------
 
@@ -212,17 +297,17 @@ def get_app(args: argparse.Namespace, request_queue: Queue, temp_dir: str):
         no_cache_str = request.args.get("noCache", "")
         no_cache = _to_bool(no_cache_str)
 
-        wav_bytes = await text_to_wav(
+        wav_chunks = await text_to_wav(
             TextToWavParams(text=text, **tts_args), no_cache=no_cache
         )
 
         audio_target = request.args.get("audioTarget", "client").strip().lower()
         if audio_target == "client":
-            return Response(wav_bytes, mimetype="audio/wav")
+            return wav_response(wav_chunks)
 
         # Play audio on server
         play_cmd = shlex.split(args.play_program)
-        subprocess.run(play_cmd, input=wav_bytes, check=True)
+        subprocess.run(play_cmd, input=b"".join(wav_chunks), check=True)
 
         return "OK"
 
@@ -253,7 +338,7 @@ def get_app(args: argparse.Namespace, request_queue: Queue, temp_dir: str):
             voice_dict["language_english"] = english_lang
 
             sample_text = SAMPLE_SENTENCES.get(short_lang, "")
-            sample_text = re.sub(r"\s+", " ", sample_text)
+            sample_text = _WHITESPACE_PATTERN.sub(" ", sample_text)
             voice_dict["sample_text"] = sample_text
 
             # Ensure aliases is not a set for JSON serialization
@@ -287,7 +372,7 @@ def get_app(args: argparse.Namespace, request_queue: Queue, temp_dir: str):
         ssml = text.strip().startswith("<")
 
         _LOGGER.debug("Speaking with voice '%s': %s", voice, text)
-        wav_bytes = await text_to_wav(
+        wav_chunks = await text_to_wav(
             TextToWavParams(
                 text=text,
                 voice=voice,
@@ -298,7 +383,7 @@ def get_app(args: argparse.Namespace, request_queue: Queue, temp_dir: str):
             )
         )
 
-        return Response(wav_bytes, mimetype="audio/wav")
+        return wav_response(wav_chunks)
 
     @app.route("/voices", methods=["GET"])
     async def api_marytts_voices():
@@ -14,15 +14,75 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #
 import argparse
+import functools
 import sys
+import typing
+from dataclasses import dataclass
 
 from ._resources import _PACKAGE, __version__
 
 _MISSING = object()
 
 
+@dataclass(frozen=True)
+class SynthesisConfig:
+    """Immutable settings for synthesis threads (from command-line arguments)"""
+
+    __slots__ = (
+        "voice",
+        "speaker",
+        "length_scale",
+        "noise_scale",
+        "noise_w",
+        "cuda",
+        "voices_dir",
+        "deterministic",
+        "preload_voice",
+        "onnx_threads",
+    )
+
+    voice: typing.Optional[str]
+    speaker: typing.Optional[int]
+    length_scale: typing.Optional[float]
+    noise_scale: typing.Optional[float]
+    noise_w: typing.Optional[float]
+    cuda: bool
+    voices_dir: typing.Optional[typing.Tuple[str, ...]]
+    deterministic: bool
+    preload_voice: typing.Tuple[str, ...]
+    onnx_threads: typing.Optional[int]
+
+    @staticmethod
+    def from_args(args: argparse.Namespace) -> "SynthesisConfig":
+        """Create config from parsed command-line arguments"""
+        return SynthesisConfig(
+            voice=args.voice,
+            speaker=args.speaker,
+            length_scale=args.length_scale,
+            noise_scale=args.noise_scale,
+            noise_w=args.noise_w,
+            cuda=args.cuda,
+            voices_dir=tuple(args.voices_dir) if args.voices_dir else None,
+            deterministic=args.deterministic,
+            preload_voice=tuple(args.preload_voice or ()),
+            onnx_threads=args.onnx_threads,
+        )
+
+
 def get_args(argv=None) -> argparse.Namespace:
     """Parse and return command-line arguments"""
+    args = _get_parser().parse_args(args=argv)
+
+    if args.version:
+        print(__version__)
+        sys.exit(0)
+
+    return args
+
+
+@functools.lru_cache(maxsize=1)
+def _get_parser() -> argparse.ArgumentParser:
+    """Create command-line argument parser (only once)"""
     parser = argparse.ArgumentParser(
         prog=_PACKAGE, description="Local HTTP web server for Mimic 3"
     )
@@ -81,6 +141,11 @@ def get_args(argv=None) -> argparse.Namespace:
         default=1,
         help="Number of synthesis threads (default: 1)",
     )
+    parser.add_argument(
+        "--onnx-threads",
+        type=int,
+        help="Number of threads used within each Onnx operator (default: onnxruntime decides)",
+    )
     parser.add_argument(
         "--max-text-length",
         type=int,
@@ -102,10 +167,5 @@ def get_args(argv=None) -> argparse.Namespace:
     parser.add_argument(
         "--version", action="store_true", help="Print version to console and exit"
     )
-    args = parser.parse_args(args=argv)
 
-    if args.version:
-        print(__version__)
-        sys.exit(0)
-
-    return args
+    return parser
@@ -18,6 +18,17 @@ import hashlib
 import typing
 from dataclasses import dataclass
 
+from mimic3_tts.utils import make_wav_header
+
+
+def _md5(data: bytes):
+    """md5 hash for cache keys (not used for security)"""
+    try:
+        # Avoids FIPS restrictions (Python 3.9+)
+        return hashlib.md5(data, usedforsecurity=False)  # type: ignore
+    except TypeError:
+        return hashlib.md5(data)
+
 
 @dataclass
 class TextToWavParams:
@@ -37,7 +48,8 @@ class TextToWavParams:
         if self.cache_id:
             return self.cache_id
 
-        return hashlib.md5(repr(self).encode()).hexdigest()
+        # Not memoized, since fields may change after the first access
+        return _md5(repr(self).encode()).hexdigest()
 
 
 @dataclass
@@ -48,3 +60,28 @@ class SynthesisRequest:
 
     loop: asyncio.AbstractEventLoop
     future: asyncio.Future
+
+
+@dataclass
+class SynthesisResult:
+    """Raw audio from synthesis, which is turned into a WAV file without copying"""
+
+    sample_rate_hz: int = 22050
+    sample_width_bytes: int = 2
+    num_channels: int = 1
+    audio_chunks: typing.Sequence[bytes] = ()
+
+    @property
+    def wav_header(self) -> bytes:
+        """44-byte WAV header for audio chunks"""
+        return make_wav_header(
+            self.sample_rate_hz,
+            self.sample_width_bytes,
+            self.num_channels,
+            sum(len(chunk) for chunk in self.audio_chunks),
+        )
+
+    @property
+    def wav_chunks(self) -> typing.List[bytes]:
+        """WAV header followed by audio chunks"""
+        return [self.wav_header, *self.audio_chunks]
@@ -13,13 +13,9 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #
-import argparse
-import io
 import logging
 import threading
-import typing
-import wave
-from queue import Queue
+from queue import SimpleQueue
 
 from mimic3_tts import (
     AudioResult,
@@ -28,84 +24,93 @@ from mimic3_tts import (
     SSMLSpeaker,
 )
 
-from .const import SynthesisRequest
+from .args import SynthesisConfig
+from .const import SynthesisRequest, SynthesisResult
 
 _LOGGER = logging.getLogger(__name__)
 
 
-def do_synthesis(item: SynthesisRequest, mimic3: Mimic3TextToSpeechSystem) -> bytes:
+def do_synthesis(
+    item: SynthesisRequest, mimic3: Mimic3TextToSpeechSystem
+) -> SynthesisResult:
     """Synthesize text into audio.
 
-    Returns: WAV bytes
+    Returns: raw audio chunks (WAV header is added by caller)
     """
     params = item.params
-    mimic3.speaker = None
-    mimic3.voice = params.voice
-
-    mimic3.settings.length_scale = params.length_scale
-    mimic3.settings.noise_scale = params.noise_scale
-    mimic3.settings.noise_w = params.noise_w
-
-    with io.BytesIO() as wav_io:
-        wav_file: wave.Wave_write = wave.open(wav_io, "wb")
-        wav_params_set = False
-
-        with wav_file:
-            try:
-                if params.ssml:
-                    # SSML
-                    results = SSMLSpeaker(mimic3).speak(params.text)
-                else:
-                    # Plain text
-                    mimic3.begin_utterance()
-                    mimic3.speak_text(params.text, text_language=params.text_language)
-                    results = mimic3.end_utterance()
-
-                for result in results:
-                    # Add audio to existing WAV file
-                    if isinstance(result, AudioResult):
-                        if not wav_params_set:
-                            wav_file.setframerate(result.sample_rate_hz)
-                            wav_file.setsampwidth(result.sample_width_bytes)
-                            wav_file.setnchannels(result.num_channels)
-                            wav_params_set = True
-
-                        wav_file.writeframes(result.audio_bytes)
-            except Exception as e:
-                if not wav_params_set:
-                    # Set default parameters so exception can propagate
-                    wav_file.setframerate(22050)
-                    wav_file.setsampwidth(2)
-                    wav_file.setnchannels(1)
-
-                raise e
-
-        wav_bytes = wav_io.getvalue()
-
-        return wav_bytes
-
-
-def do_synthesis_proc(args: argparse.Namespace, request_queue: Queue):
+
+    if (not params.text) or params.text.isspace():
+        # Nothing to speak
+        return SynthesisResult()
+
+    # Only change voice/settings if they differ from the previous request
+    voice, speaker = params.voice, None
+    if "#" in voice:
+        voice, speaker = voice.split("#", maxsplit=1)
+
+    if mimic3.voice != voice:
+        mimic3.voice = voice
+
+    if mimic3.speaker != speaker:
+        mimic3.speaker = speaker
+
+    settings = mimic3.settings
+    scales = (params.length_scale, params.noise_scale, params.noise_w)
+    if (settings.length_scale, settings.noise_scale, settings.noise_w) != scales:
+        settings.length_scale, settings.noise_scale, settings.noise_w = scales
+
+    if params.ssml:
+        # SSML
+        results = SSMLSpeaker(mimic3).speak(params.text)
+    else:
+        # Plain text
+        mimic3.begin_utterance()
+        mimic3.speak_text(params.text, text_language=params.text_language)
+        results = mimic3.end_utterance()
+
+    # Results are filtered once, so the WAV writing below has no type checks.
+    # AudioResult is never subclassed, so an exact type match is sufficient.
+    audio_results = [
+        result
+        for result in results
+        if type(result) is AudioResult  # pylint: disable=unidiomatic-typecheck
+    ]
+    if not audio_results:
+        return SynthesisResult()
+
+    # Audio parameters come from the first chunk of audio
+    first_result = audio_results[0]
+
+    return SynthesisResult(
+        sample_rate_hz=first_result.sample_rate_hz,
+        sample_width_bytes=first_result.sample_width_bytes,
+        num_channels=first_result.num_channels,
+        audio_chunks=[result.audio_bytes for result in audio_results],
+    )
+
+
+def do_synthesis_proc(config: SynthesisConfig, request_queue: SimpleQueue):
     """Thread handler for synthesis requests"""
     try:
         # Load Mimic 3
         mimic3 = Mimic3TextToSpeechSystem(
             Mimic3Settings(
-                voice=args.voice,
-                speaker=args.speaker,
-                length_scale=args.length_scale,
-                noise_scale=args.noise_scale,
-                noise_w=args.noise_w,
-                use_cuda=args.cuda,
-                voices_directories=args.voices_dir,
-                use_deterministic_compute=args.deterministic,
+                voice=config.voice,
+                speaker=config.speaker,
+                length_scale=config.length_scale,
+                noise_scale=config.noise_scale,
+                noise_w=config.noise_w,
+                use_cuda=config.cuda,
+                voices_directories=config.voices_dir,
+                use_deterministic_compute=config.deterministic,
+                onnx_intra_op_threads=config.onnx_threads,
             )
         )
 
         with mimic3:
-            if args.preload_voice:
+            if config.preload_voice:
                 # Ensure voices are preloaded
-                for voice_key in args.preload_voice:
+                for voice_key in dict.fromkeys(config.preload_voice):
                     _LOGGER.debug("Preloading voice: %s", voice_key)
                     mimic3.preload_voice(voice_key)
 
@@ -119,8 +124,6 @@ def do_synthesis_proc(args: argparse.Namespace, request_queue: Queue):
                     # Exit signal
                     break
 
-                item = typing.cast(SynthesisRequest, item)
-
                 try:
                     result = do_synthesis(item, mimic3)
 
@@ -1,3 +1,4 @@
+import typing
 from pathlib import Path
 
 from opentts_abc import (
@@ -14,6 +15,18 @@ from opentts_abc.ssml import SSMLSpeaker
 
 from ._resources import __version__
 from .const import DEFAULT_VOICE
-from .tts import Mimic3Settings, Mimic3TextToSpeechSystem
+
+if typing.TYPE_CHECKING:
+    from .tts import Mimic3Settings, Mimic3TextToSpeechSystem  # noqa: F401
 
 __author__ = "Michael Hansen"
+
+
+def __getattr__(name: str):
+    # Load TTS system on first use, since it imports onnxruntime, gruut, etc.
+    if name in ("Mimic3Settings", "Mimic3TextToSpeechSystem"):
+        from . import tts
+
+        return getattr(tts, name)
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
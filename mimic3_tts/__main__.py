@@ -16,27 +16,32 @@
 #
 import argparse
 import csv
-import io
 import logging
 import os
+import re
 import shlex
 import shutil
 import string
+import struct
 import subprocess
 import sys
 import tempfile
 import threading
 import time
 import typing
-import wave
-from dataclasses import dataclass, field
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
 from enum import Enum
 from pathlib import Path
-from queue import Queue
 
+from . import AudioResult, MarkResult, SSMLSpeaker
 from ._resources import _PACKAGE
+from .utils import WAV_UNKNOWN_SIZE, make_wav_header
 
 if typing.TYPE_CHECKING:
+    import requests  # noqa: F401
+
     from . import BaseResult, Mimic3TextToSpeechSystem  # noqa: F401
 
 
@@ -44,9 +49,62 @@ _LOGGER = logging.getLogger(_PACKAGE)
 
 _DEFAULT_PLAY_PROGRAMS = ["paplay", "play -q", "aplay -q"]
 
+# Arguments needed for known players to read WAV audio from stdin
+_PLAY_STDIN_ARGS: typing.Dict[str, typing.List[str]] = {
+    "paplay": [],
+    "aplay": [],
+    "play": ["-t", "wav", "-"],
+}
+
+_SENTENCE_SPLIT_PATTERN = re.compile(r"(?<=[.!?])\s+")
+
+# Matches punctuation (except underscores) to remove from file names
+_FILE_NAME_PUNCTUATION_PATTERN = re.compile(
+    f"[{re.escape(string.punctuation.replace('_', ''))}]"
+)
+
+_T = typing.TypeVar("_T")
+
 # -----------------------------------------------------------------------------
 
 
+class BoundedQueue(typing.Generic[_T]):
+    """Minimal FIFO queue between one producer and one consumer thread"""
+
+    __slots__ = ("_items", "_maxsize", "_condition")
+
+    def __init__(self, maxsize: int = 0):
+        self._items: "typing.Deque[_T]" = deque()
+        self._maxsize = maxsize
+        self._condition = threading.Condition(threading.Lock())
+
+    def put(self, item: _T):
+        """Add item to the queue, waiting while it's full"""
+        with self._condition:
+            while 0 < self._maxsize <= len(self._items):
+                self._condition.wait()
+
+            self._items.append(item)
+            self._condition.notify()
+
+    def get(self) -> _T:
+        """Remove and return the next item, waiting while the queue is empty"""
+        with self._condition:
+            while not self._items:
+                self._condition.wait()
+
+            item = self._items.popleft()
+            self._condition.notify()
+
+            return item
+
+    def clear(self):
+        """Remove all items without waiting"""
+        with self._condition:
+            self._items.clear()
+            self._condition.notify_all()
+
+
 @dataclass
 class ResultToProcess:
     result: "BaseResult"
@@ -62,14 +120,33 @@ class CommandLineInterfaceState:
     tts: typing.Optional["Mimic3TextToSpeechSystem"] = None
     text_from_stdin: bool = False
 
-    all_audio: bytes = field(default_factory=bytes)
+    wav_output: typing.Optional[typing.BinaryIO] = None
+    """Combined audio is written here as it's synthesized (stdout or temp file)"""
+
+    wav_output_start: int = 0
+    """Position of WAV header in wav_output"""
+
+    num_audio_bytes: int = 0
+    """Number of audio bytes written to wav_output (excluding header)"""
+
     sample_rate_hz: int = 22050
     sample_width_bytes: int = 2
     num_channels: int = 1
 
-    result_queue: typing.Optional["Queue[typing.Optional[ResultToProcess]]"] = None
+    result_queue: typing.Optional[BoundedQueue[typing.Optional[ResultToProcess]]] = None
     result_thread: typing.Optional[threading.Thread] = None
 
+    playback_queue: typing.Optional[BoundedQueue[typing.Optional[AudioResult]]] = None
+    playback_thread: typing.Optional[threading.Thread] = None
+
+    http_session: typing.Optional["requests.Session"] = None
+
+    play_command: typing.Optional[typing.List[str]] = None
+    """First program from --play-program that's installed"""
+
+    play_stdin_command: typing.Optional[typing.List[str]] = None
+    """Same as play_command, but reads WAV audio from stdin (if supported)"""
+
 
 class OutputNaming(str, Enum):
     """Format used for output file names"""
@@ -133,8 +210,6 @@ def main():
 
 def initialize_args(state: CommandLineInterfaceState):
     """Initialze CLI state from command-line arguments"""
-    import numpy as np
-
     args = state.args
 
     # Create output directory
@@ -155,7 +230,28 @@ def initialize_args(state: CommandLineInterfaceState):
     else:
         state.mark_writer = sys.stdout
 
+    # Split play programs into commands and find audio player once, instead of
+    # for each WAV file.
+    args.play_program = [
+        shlex.split(play_program) for play_program in args.play_program
+    ]
+    state.play_command = next(
+        (
+            play_command
+            for play_command in reversed(args.play_program)
+            if play_command and shutil.which(play_command[0])
+        ),
+        None,
+    )
+
+    if state.play_command:
+        stdin_args = _PLAY_STDIN_ARGS.get(os.path.basename(state.play_command[0]))
+        if stdin_args is not None:
+            state.play_stdin_command = [*state.play_command, *stdin_args]
+
     if args.seed is not None:
+        import numpy as np
+
         _LOGGER.debug("Setting random seed to %s", args.seed)
         np.random.seed(args.seed)
 
@@ -183,8 +279,12 @@ def initialize_args(state: CommandLineInterfaceState):
             stdin_format = StdinFormat.DOCUMENT
 
         if stdin_format == StdinFormat.DOCUMENT:
-            # One big line
-            state.texts = [sys.stdin.read()]
+            if args.ssml:
+                # Synthesize sentences/paragraphs as they're read
+                state.texts = stream_ssml_documents(sys.stdin)
+            else:
+                # One big line
+                state.texts = [sys.stdin.read()]
         else:
             # Multiple lines
             state.texts = sys.stdin
@@ -199,17 +299,17 @@ def initialize_args(state: CommandLineInterfaceState):
         # up across multiple
         # lines.
         def process_on_blank_line(lines: typing.Iterable[str]):
-            text = ""
+            text_lines: typing.List[str] = []
             for line in lines:
                 line = line.strip()
                 if not line:
-                    if text:
-                        yield text
+                    if text_lines:
+                        yield " ".join(text_lines)
 
-                    text = ""
+                    text_lines.clear()
                     continue
 
-                text += " " + line
+                text_lines.append(line)
 
         state.texts = process_on_blank_line(state.texts)
 
@@ -230,12 +330,12 @@ def initialize_args(state: CommandLineInterfaceState):
 
 def initialize_tts(state: CommandLineInterfaceState):
     """Create Mimic 3 TTS from command-line arguments"""
-    from mimic3_tts import Mimic3Settings, Mimic3TextToSpeechSystem  # noqa: F811
-
     args = state.args
 
     if not args.remote:
         # Local TTS
+        from mimic3_tts import Mimic3Settings, Mimic3TextToSpeechSystem  # noqa: F811
+
         state.tts = Mimic3TextToSpeechSystem(
             Mimic3Settings(
                 length_scale=args.length_scale,
@@ -244,11 +344,21 @@ def initialize_tts(state: CommandLineInterfaceState):
                 voices_directories=args.voices_dir,
                 use_cuda=args.cuda,
                 use_deterministic_compute=args.deterministic,
+                onnx_intra_op_threads=args.onnx_threads,
             )
         )
 
         state.tts.voice = args.voice
         state.tts.speaker = args.speaker
+    else:
+        # Remote TTS (keep connections alive between requests)
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        state.http_session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=args.remote_concurrency)
+        state.http_session.mount("http://", adapter)
+        state.http_session.mount("https://", adapter)
 
     if args.voices:
         # Don't bother with the rest of the initialization
@@ -264,21 +374,30 @@ def initialize_tts(state: CommandLineInterfaceState):
                 _LOGGER.debug("Preloading voice: %s", voice_key)
                 state.tts.preload_voice(voice_key)
 
-    state.result_queue = Queue(maxsize=args.result_queue_size)
+    state.result_queue = BoundedQueue(maxsize=args.result_queue_size)
 
     state.result_thread = threading.Thread(
         target=process_result, daemon=True, args=(state,)
     )
     state.result_thread.start()
 
+    if args.interactive and (not args.stdout):
+        # Play audio in a separate thread, so results keep being processed
+        state.playback_queue = BoundedQueue(maxsize=args.result_queue_size)
+        state.playback_thread = threading.Thread(
+            target=process_playback, daemon=True, args=(state,)
+        )
+        state.playback_thread.start()
+
 
 def process_result(state: CommandLineInterfaceState):
     try:
-        from mimic3_tts import AudioResult, MarkResult
-
         assert state.result_queue is not None
         args = state.args
 
+        if args.result_thread_cpu is not None:
+            pin_current_thread(args.result_thread_cpu)
+
         while True:
             result_todo = state.result_queue.get()
             if result_todo is None:
@@ -291,33 +410,21 @@ def process_result(state: CommandLineInterfaceState):
 
                 if isinstance(result, AudioResult):
                     if args.interactive or args.output_dir:
-                        # Convert to WAV audio
-                        wav_bytes: typing.Optional[bytes] = None
                         if args.interactive:
                             if args.stdout:
                                 # Write audio to stdout
                                 sys.stdout.buffer.write(result.audio_bytes)
                                 sys.stdout.buffer.flush()
-                            else:
+                            elif state.playback_queue is not None:
                                 # Play sound
-                                if not wav_bytes:
-                                    wav_bytes = result.to_wav_bytes()
-
-                                if wav_bytes:
-                                    play_wav_bytes(state.args, wav_bytes)
+                                state.playback_queue.put(result)
 
                         if args.output_dir:
-                            if not wav_bytes:
-                                wav_bytes = result.to_wav_bytes()
-
                             # Determine file name
                             if args.output_naming == OutputNaming.TEXT:
                                 # Use text itself
-                                file_name = line.strip().replace(" ", "_")
-                                file_name = file_name.translate(
-                                    str.maketrans(
-                                        "", "", string.punctuation.replace("_", "")
-                                    )
+                                file_name = _FILE_NAME_PUNCTUATION_PATTERN.sub(
+                                    "", line.strip().replace(" ", "_")
                                 )
                             elif args.output_naming == OutputNaming.TIME:
                                 # Use timestamp
@@ -327,15 +434,22 @@ def process_result(state: CommandLineInterfaceState):
 
                             assert file_name, f"No file name for text: {line}"
                             wav_path = args.output_dir / (file_name + ".wav")
-                            wav_path.write_bytes(wav_bytes)
+                            with open(wav_path, "wb") as wav_file:
+                                write_wav(wav_file, result)
 
                             _LOGGER.debug("Wrote %s", wav_path)
                     else:
-                        # Combine all audio and output to stdout at the end
-                        state.all_audio += result.audio_bytes
-                        state.sample_rate_hz = result.sample_rate_hz
-                        state.sample_width_bytes = result.sample_width_bytes
-                        state.num_channels = result.num_channels
+                        # Combine all audio into a single WAV file as it arrives
+                        if state.wav_output is None:
+                            begin_wav_output(state, result)
+
+                        assert state.wav_output is not None
+                        state.wav_output.write(result.audio_bytes)
+                        if not state.wav_output.seekable():
+                            # Only flush for pipes, where audio may be consumed live
+                            state.wav_output.flush()
+
+                        state.num_audio_bytes += len(result.audio_bytes)
                 elif isinstance(result, MarkResult):
                     if state.mark_writer:
                         print(result.name, file=state.mark_writer)
@@ -345,19 +459,55 @@ def process_result(state: CommandLineInterfaceState):
         _LOGGER.exception("process_result")
 
 
+def pin_current_thread(cpu: int):
+    """Keep the calling thread on one CPU and try to raise its priority (Linux only)"""
+    if not hasattr(os, "sched_setaffinity"):
+        _LOGGER.debug("Thread CPU affinity is not supported on this platform")
+        return
+
+    try:
+        # On Linux, pid 0 and nice() apply to the calling thread only
+        os.sched_setaffinity(0, {cpu})
+        _LOGGER.debug("Pinned result thread to CPU %s", cpu)
+    except OSError:
+        _LOGGER.warning("Failed to pin result thread to CPU %s", cpu)
+
+    try:
+        os.nice(-5)
+    except OSError:
+        # Raising priority requires privileges
+        _LOGGER.debug("Not allowed to raise result thread priority")
+
+
+def process_playback(state: CommandLineInterfaceState):
+    try:
+        assert state.playback_queue is not None
+
+        while True:
+            result = state.playback_queue.get()
+            if result is None:
+                break
+
+            try:
+                play_audio_result(state, result)
+            except Exception:
+                _LOGGER.exception("Error playing audio")
+    except Exception:
+        _LOGGER.exception("process_playback")
+
+
 def process_line(
     line: str,
     state: CommandLineInterfaceState,
     line_id: str = "",
     line_voice: typing.Optional[str] = None,
+    remote_wav_bytes: "typing.Optional[Future[bytes]]" = None,
 ):
     assert state.result_queue is not None
     args = state.args
 
     if state.tts:
         # Local TTS
-        from mimic3_tts import SSMLSpeaker
-
         assert state.tts is not None
 
         args = state.args
@@ -381,31 +531,16 @@ def process_line(
             results = state.tts.end_utterance()
     else:
         # Remote TTS
-        from mimic3_tts import AudioResult
-
-        voice: typing.Optional[str] = None
-        if line_voice:
-            if line_voice.startswith("#"):
-                # Same voice, but different speaker
-                if args.voice:
-                    voice = f"{args.voice}{line_voice}"
-            else:
-                # Different voice
-                voice = line_voice
-
         # Get remote WAV data and repackage as AudioResult
-        wav_bytes = get_remote_wav_bytes(state, line, voice=voice)
-        with io.BytesIO(wav_bytes) as wav_io:
-            wav_reader: wave.Wave_read = wave.open(wav_io, "rb")
-            with wav_reader as wav_file:
-                results = [
-                    AudioResult(
-                        sample_rate_hz=wav_file.getframerate(),
-                        sample_width_bytes=wav_file.getsampwidth(),
-                        num_channels=wav_file.getnchannels(),
-                        audio_bytes=wav_file.readframes(wav_file.getnframes()),
-                    )
-                ]
+        if remote_wav_bytes is not None:
+            # Request was already sent
+            wav_bytes = remote_wav_bytes.result()
+        else:
+            wav_bytes = get_remote_wav_bytes(
+                state, line, voice=get_remote_voice(args, line_voice)
+            )
+
+        results = [parse_wav(wav_bytes)]
 
     # Add results to processing queue
     for result in results:
@@ -428,6 +563,44 @@ def process_lines(state: CommandLineInterfaceState):
 
     args = state.args
 
+    # Lines are synthesized on a single worker thread (TTS is not thread-safe),
+    # while the next lines are read and parsed here.
+    executor = ThreadPoolExecutor(max_workers=1)
+    pending_lines: "typing.Deque[Future]" = deque()
+
+    # Remote requests are sent concurrently, but results are still processed
+    # in order by the single worker thread.
+    remote_executor: typing.Optional[ThreadPoolExecutor] = None
+    if not state.tts:
+        remote_executor = ThreadPoolExecutor(max_workers=args.remote_concurrency)
+
+    def submit_line(
+        line: str, line_id: str = "", line_voice: typing.Optional[str] = None
+    ):
+        remote_wav_bytes: "typing.Optional[Future[bytes]]" = None
+        if remote_executor is not None:
+            remote_wav_bytes = remote_executor.submit(
+                get_remote_wav_bytes,
+                state,
+                line,
+                voice=get_remote_voice(args, line_voice),
+            )
+
+        pending_lines.append(
+            executor.submit(
+                process_line,
+                line,
+                state,
+                line_id=line_id,
+                line_voice=line_voice,
+                remote_wav_bytes=remote_wav_bytes,
+            )
+        )
+
+        # Limit how far ahead of synthesis input is read
+        while len(pending_lines) > args.result_queue_size:
+            pending_lines.popleft().result()
+
     try:
         result_idx = 0
 
@@ -440,22 +613,51 @@ def process_lines(state: CommandLineInterfaceState):
 
             if args.output_naming == OutputNaming.ID:
                 # Line has the format id|text instead of just text
-                with io.StringIO(line) as line_io:
-                    reader = csv.reader(line_io, delimiter=args.csv_delimiter)
-                    row = next(reader)
-                    line_id, line = row[0], row[-1]
-                    if args.csv_voice:
-                        line_voice = row[1]
-
-            process_line(line, state, line_id=line_id, line_voice=line_voice)
+                if (len(args.csv_delimiter) == 1) and ('"' not in line):
+                    # Fast path: no quoting
+                    row = line.split(args.csv_delimiter)
+                else:
+                    row = next(csv.reader([line], delimiter=args.csv_delimiter))
+
+                line_id, line = row[0], row[-1]
+                if args.csv_voice:
+                    line_voice = row[1]
+
+            if (
+                args.sentence_split
+                and (not args.ssml)
+                and (args.output_naming != OutputNaming.ID)
+            ):
+                # Synthesize one sentence at a time to get audio out sooner.
+                # Lines named by id are kept whole, so there is one WAV per id.
+                for sentence in split_sentences(line):
+                    submit_line(sentence, line_id=line_id, line_voice=line_voice)
+            else:
+                submit_line(line, line_id=line_id, line_voice=line_voice)
+
             result_idx += 1
 
+        # Wait for remaining lines in order
+        while pending_lines:
+            pending_lines.popleft().result()
+
     except KeyboardInterrupt:
+        for future in pending_lines:
+            future.cancel()
+
         if state.result_queue is not None:
-            # Draw audio playback queue
-            while not state.result_queue.empty():
-                state.result_queue.get()
+            # Drain result queue
+            state.result_queue.clear()
+
+        if state.playback_queue is not None:
+            # Drain audio playback queue
+            state.playback_queue.clear()
     finally:
+        executor.shutdown(wait=True)
+
+        if remote_executor is not None:
+            remote_executor.shutdown(wait=True)
+
         # Wait for raw stream to finish
         if state.result_queue is not None:
             state.result_queue.put(None)
@@ -465,52 +667,239 @@ def process_lines(state: CommandLineInterfaceState):
 
     # -------------------------------------------------------------------------
 
-    # Write combined audio to stdout
-    if state.all_audio:
+    if state.wav_output is not None:
+        end_wav_output(state)
+
+
+def split_sentences(text: str) -> typing.List[str]:
+    """Split text into sentences after terminal punctuation"""
+    return [sentence for sentence in _SENTENCE_SPLIT_PATTERN.split(text) if sentence]
+
+
+def stream_ssml_documents(ssml_file: typing.TextIO) -> typing.Iterable[str]:
+    """Split an SSML document into one document per top-level <s> or <p> as it's read.
+
+    Yields the whole document if it can't be split.
+    """
+    from xml.etree import ElementTree as etree
+
+    from opentts_abc.ssml import tag_no_namespace
+
+    parser: "etree.XMLPullParser[etree.Element]" = etree.XMLPullParser(
+        events=("start", "end")
+    )
+
+    # Raw text is kept until the first split, in case the document isn't XML
+    raw_chunks: typing.Optional[typing.List[str]] = []
+
+    root: typing.Optional[etree.Element] = None
+    depth = 0
+    can_split = True
+
+    # Top-level element waiting for its tail text
+    pending_elem: typing.Optional[etree.Element] = None
+
+    def flush_pending():
+        nonlocal can_split, pending_elem, raw_chunks
+
+        if (root is None) or (pending_elem is None):
+            return None
+
+        elem, pending_elem = pending_elem, None
+        if (elem.tail or "").strip():
+            # Text between elements
+            can_split = False
+            return None
+
+        root.remove(elem)
+        elem.tail = None
+        raw_chunks = None
+
+        # Keep attributes of <speak>, such as xml:lang
+        elem_root = etree.Element(root.tag, root.attrib)
+        elem_root.append(elem)
+
+        return etree.tostring(elem_root, encoding="unicode")
+
+    try:
+        for chunk in iter(lambda: ssml_file.read(4096), ""):
+            if raw_chunks is not None:
+                raw_chunks.append(chunk)
+
+            parser.feed(chunk)
+            # Only start/end events are requested, which always have an element
+            events = typing.cast(
+                typing.Iterator[typing.Tuple[str, etree.Element]],
+                parser.read_events(),
+            )
+            for event, elem in events:
+                if event == "start":
+                    depth += 1
+                    if depth == 1:
+                        root = elem
+                        can_split = tag_no_namespace(elem.tag) == "speak"
+                    elif (depth == 2) and can_split:
+                        elem_doc = flush_pending()
+                        if elem_doc:
+                            yield elem_doc
+
+                        assert root is not None
+                        if (root.text or "").strip() or (
+                            tag_no_namespace(elem.tag) not in {"s", "p"}
+                        ):
+                            # Mixed content or other elements
+                            can_split = False
+                elif event == "end":
+                    depth -= 1
+                    if (depth == 1) and can_split:
+                        pending_elem = elem
+                    elif (depth == 0) and can_split:
+                        elem_doc = flush_pending()
+                        if elem_doc:
+                            yield elem_doc
+
+        parser.close()
+    except etree.ParseError:
+        if raw_chunks is None:
+            # Part of the document was already synthesized
+            raise
+
+        # Not XML, so pass through as-is
+        raw_chunks.append(ssml_file.read())
+        yield "".join(raw_chunks)
+        return
+
+    if (root is not None) and ((not can_split) or (raw_chunks is not None)):
+        # Whatever is left of the document
+        yield etree.tostring(root, encoding="unicode")
+
+
+def begin_wav_output(state: CommandLineInterfaceState, first_result: AudioResult):
+    """Start writing combined audio to stdout (or a temp file for playback)"""
+    state.sample_rate_hz = first_result.sample_rate_hz
+    state.sample_width_bytes = first_result.sample_width_bytes
+    state.num_channels = first_result.num_channels
+
+    if sys.stdout.isatty() and (not state.args.stdout):
+        # Play audio at the end
+        temp_file = tempfile.NamedTemporaryFile(  # pylint: disable=consider-using-with
+            mode="wb+", suffix=".wav"
+        )
+        state.wav_output = typing.cast(typing.BinaryIO, temp_file)
+    else:
+        # Write output directly to stdout
         _LOGGER.debug("Writing WAV audio to stdout")
+        state.wav_output = sys.stdout.buffer
+
+    if state.wav_output.seekable():
+        state.wav_output_start = state.wav_output.tell()
+
+    # Final size is patched in at the end, if possible
+    state.wav_output.write(
+        make_wav_header(
+            state.sample_rate_hz,
+            state.sample_width_bytes,
+            state.num_channels,
+            WAV_UNKNOWN_SIZE,
+        )
+    )
 
-        if sys.stdout.isatty() and (not state.args.stdout):
-            with io.BytesIO() as wav_io:
-                wav_file_play: wave.Wave_write = wave.open(wav_io, "wb")
-                with wav_file_play:
-                    wav_file_play.setframerate(state.sample_rate_hz)
-                    wav_file_play.setsampwidth(state.sample_width_bytes)
-                    wav_file_play.setnchannels(state.num_channels)
-                    wav_file_play.writeframes(state.all_audio)
 
-                play_wav_bytes(state.args, wav_io.getvalue())
-        else:
-            # Write output directly to stdout
-            wav_file_write: wave.Wave_write = wave.open(sys.stdout.buffer, "wb")
-            with wav_file_write:
-                wav_file_write.setframerate(state.sample_rate_hz)
-                wav_file_write.setsampwidth(state.sample_width_bytes)
-                wav_file_write.setnchannels(state.num_channels)
-                wav_file_write.writeframes(state.all_audio)
+def end_wav_output(state: CommandLineInterfaceState):
+    """Finish writing combined audio and play it if necessary"""
+    assert state.wav_output is not None
+
+    if state.wav_output.seekable():
+        # Write header again with the correct size
+        state.wav_output.seek(state.wav_output_start)
+        state.wav_output.write(
+            make_wav_header(
+                state.sample_rate_hz,
+                state.sample_width_bytes,
+                state.num_channels,
+                state.num_audio_bytes,
+            )
+        )
+        state.wav_output.seek(0, os.SEEK_END)
+
+    state.wav_output.flush()
+
+    if state.wav_output is not sys.stdout.buffer:
+        # Play and delete temp file
+        with state.wav_output:
+            play_wav_file(state, state.wav_output.name)
 
-            sys.stdout.buffer.flush()
+    state.wav_output = None
 
 
 def shutdown_tts(state: CommandLineInterfaceState):
+    if state.playback_queue is not None:
+        # Wait for audio to finish playing
+        state.playback_queue.put(None)
+
+    if state.playback_thread is not None:
+        state.playback_thread.join()
+        state.playback_thread = None
+
     if state.tts:
         state.tts.shutdown()
         state.tts = None
 
+    if state.http_session is not None:
+        state.http_session.close()
+        state.http_session = None
+
+
+def write_wav(wav_file: typing.IO[bytes], result: AudioResult):
+    """Write audio result as WAV without copying its audio bytes"""
+    wav_file.write(
+        make_wav_header(
+            result.sample_rate_hz,
+            result.sample_width_bytes,
+            result.num_channels,
+            len(result.audio_bytes),
+        )
+    )
+    wav_file.write(result.audio_bytes)
+
+
+def play_audio_result(state: CommandLineInterfaceState, result: AudioResult):
+    if state.play_stdin_command:
+        # Pipe audio to player instead of going through a temp file
+        _LOGGER.debug("Playing WAV audio: %s", state.play_stdin_command)
+        with subprocess.Popen(
+            state.play_stdin_command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
+        ) as play_proc:
+            assert play_proc.stdin is not None
+            with play_proc.stdin:
+                write_wav(play_proc.stdin, result)
+
+        if play_proc.returncode != 0:
+            raise subprocess.CalledProcessError(
+                play_proc.returncode, state.play_stdin_command
+            )
+
+        return
 
-def play_wav_bytes(args: argparse.Namespace, wav_bytes: bytes):
     with tempfile.NamedTemporaryFile(mode="wb+", suffix=".wav") as wav_file:
-        wav_file.write(wav_bytes)
-        wav_file.seek(0)
+        write_wav(wav_file, result)
+        wav_file.flush()
 
-        for play_program in reversed(args.play_program):
-            play_cmd = shlex.split(play_program)
-            if not shutil.which(play_cmd[0]):
-                continue
+        play_wav_file(state, wav_file.name)
 
-            play_cmd.append(wav_file.name)
-            _LOGGER.debug("Playing WAV file: %s", play_cmd)
-            subprocess.check_output(play_cmd)
-            break
+
+def play_wav_file(state: CommandLineInterfaceState, wav_path: str):
+    if not state.play_command:
+        _LOGGER.debug("No program available to play WAV file: %s", wav_path)
+        return
+
+    play_cmd = [*state.play_command, wav_path]
+    _LOGGER.debug("Playing WAV file: %s", play_cmd)
+
+    # Player output isn't needed, so don't buffer it
+    subprocess.run(play_cmd, check=True, stdout=subprocess.DEVNULL)
 
 
 def print_voices(state: CommandLineInterfaceState):
@@ -534,27 +923,78 @@ def print_voices(state: CommandLineInterfaceState):
 
 
 def get_remote_voices(state: CommandLineInterfaceState) -> typing.List:
-    import requests
-
     from mimic3_tts import Voice
 
+    assert state.http_session is not None
     args = state.args
 
     url = f"{args.remote}/api/voices"
     _LOGGER.debug("Getting voices from remote server at %s", url)
 
-    voices_json = requests.get(url).json()
+    voices_json = state.http_session.get(url).json()
 
     return [Voice(**voice_args) for voice_args in voices_json]
 
 
+def parse_wav(wav_bytes: bytes) -> AudioResult:
+    """Parse WAV data into an audio result without copying the audio"""
+    if (wav_bytes[:4] != b"RIFF") or (wav_bytes[8:12] != b"WAVE"):
+        raise ValueError("Not a WAV file")
+
+    sample_rate_hz = 22050
+    sample_width_bytes = 2
+    num_channels = 1
+
+    offset = 12
+    while (offset + 8) <= len(wav_bytes):
+        chunk_id, chunk_size = struct.unpack_from("<4sI", wav_bytes, offset)
+        offset += 8
+
+        if chunk_id == b"fmt ":
+            num_channels, sample_rate_hz = struct.unpack_from(
+                "<HI", wav_bytes, offset + 2
+            )
+            bits_per_sample = struct.unpack_from("<H", wav_bytes, offset + 14)[0]
+            sample_width_bytes = bits_per_sample // 8
+        elif chunk_id == b"data":
+            # Audio is a view into the WAV data
+            audio_bytes = memoryview(wav_bytes)[offset : offset + chunk_size]
+            return AudioResult(
+                sample_rate_hz=sample_rate_hz,
+                sample_width_bytes=sample_width_bytes,
+                num_channels=num_channels,
+                audio_bytes=typing.cast(bytes, audio_bytes),
+            )
+
+        # Chunks are padded to an even size
+        offset += chunk_size + (chunk_size % 2)
+
+    raise ValueError("No data chunk in WAV file")
+
+
+def get_remote_voice(
+    args: argparse.Namespace, line_voice: typing.Optional[str] = None
+) -> typing.Optional[str]:
+    """Get voice to request from remote server for a line"""
+    voice: typing.Optional[str] = None
+    if line_voice:
+        if line_voice.startswith("#"):
+            # Same voice, but different speaker
+            if args.voice:
+                voice = f"{args.voice}{line_voice}"
+        else:
+            # Different voice
+            voice = line_voice
+
+    return voice
+
+
 def get_remote_wav_bytes(
     state: CommandLineInterfaceState,
     text: str,
     voice: typing.Optional[str] = None,
 ) -> bytes:
-    import requests
-
+    assert state.http_session is not None
     args = state.args
 
     if args.ssml:
@@ -584,7 +1024,9 @@ def get_remote_wav_bytes(
     url = f"{args.remote}/api/tts"
     _LOGGER.debug("Synthesizing text remotely at %s", url)
 
-    wav_bytes = requests.post(url, headers=headers, params=params, data=text).content
+    wav_bytes = state.http_session.post(
+        url, headers=headers, params=params, data=text
+    ).content
 
     return wav_bytes
 
@@ -606,6 +1048,12 @@ def get_args(argv=None):
         const="http://localhost:59125",
         help="Connect to Mimic 3 HTTP web server for synthesis (default: localhost)",
     )
+    parser.add_argument(
+        "--remote-concurrency",
+        type=int,
+        default=4,
+        help="Maximum number of concurrent requests to remote server (default: 4)",
+    )
     parser.add_argument(
         "--stdin-format",
         choices=[str(v.value) for v in StdinFormat],
@@ -678,6 +1126,7 @@ def get_args(argv=None):
     # Miscellaneous
     parser.add_argument(
         "--result-queue-size",
+        type=int,
         default=5,
         help="Maximum number of sentences to maintain in output queue (default: 5)",
     )
@@ -687,6 +1136,11 @@ def get_args(argv=None):
         help="Process text only after encountering a blank line",
     )
     parser.add_argument("--ssml", action="store_true", help="Input text is SSML")
+    parser.add_argument(
+        "--sentence-split",
+        action="store_true",
+        help="Synthesize each line one sentence at a time (ignored for SSML and --output-naming id)",
+    )
     parser.add_argument(
         "--stdout",
         action="store_true",
@@ -711,7 +1165,17 @@ def get_args(argv=None):
         action="store_true",
         help="Ensure that the same audio is always synthesized from the same text",
     )
+    parser.add_argument(
+        "--onnx-threads",
+        type=int,
+        help="Number of threads used within each Onnx operator (default: onnxruntime decides)",
+    )
     parser.add_argument("--seed", type=int, help="Set random seed (default: not set)")
+    parser.add_argument(
+        "--result-thread-cpu",
+        type=int,
+        help="Pin the thread that outputs audio to this CPU (Linux only)",
+    )
     parser.add_argument("--version", action="store_true", help="Print version and exit")
     parser.add_argument(
         "--debug", action="store_true", help="Print DEBUG messages to the console"
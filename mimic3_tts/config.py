@@ -14,21 +14,53 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #
 """Configuration classes"""
-import collections
+import copy
 import json
 import typing
-from dataclasses import dataclass, field
+from collections.abc import Mapping, MutableMapping
+from dataclasses import dataclass, field, fields
 from enum import Enum
 from pathlib import Path
 
 import numpy as np
-from dataclasses_json import DataClassJsonMixin
 from gruut_ipa import IPA
+from mashumaro.mixins.json import DataClassJSONMixin
 from phonemes2ids import BlankBetween
 
+try:
+    # Faster JSON, if installed
+    import orjson
+except ImportError:
+    orjson = None  # type: ignore
 
+_T = typing.TypeVar("_T")
+
+
+def _add_slots(cls: typing.Type[_T]) -> typing.Type[_T]:
+    """Recreate a dataclass with __slots__ (same as slots=True in Python 3.10+)"""
+    # cls is a dataclass, which mypy can't tell from a TypeVar
+    field_names = tuple(f.name for f in fields(typing.cast(typing.Any, cls)))
+    cls_dict = dict(cls.__dict__)
+    cls_dict["__slots__"] = field_names
+
+    # Class attributes for default values would conflict with slots
+    for field_name in field_names:
+        cls_dict.pop(field_name, None)
+
+    cls_dict.pop("__dict__", None)
+    cls_dict.pop("__weakref__", None)
+
+    # Same metaclass as the original class
+    metaclass: typing.Any = type(cls)
+    slots_cls: typing.Type[_T] = metaclass(cls.__name__, cls.__bases__, cls_dict)
+    slots_cls.__qualname__ = cls.__qualname__
+
+    return slots_cls
+
+
+@_add_slots
 @dataclass
-class AudioConfig(DataClassJsonMixin):
+class AudioConfig(DataClassJSONMixin):
     """Audio input/output details"""
 
     filter_length: int = 1024
@@ -67,50 +99,80 @@ class AudioConfig(DataClassJsonMixin):
     # Normalization
     # -------------------------------------------------------------------------
 
-    def normalize(self, mel_db: np.ndarray) -> np.ndarray:
-        """Put values in [0, max_norm] or [-max_norm, max_norm]"""
-        mel_norm = ((mel_db - self.ref_level_db) - self.min_level_db) / (
-            -self.min_level_db
-        )
+    def normalize(
+        self,
+        mel_db: np.ndarray,
+        out: typing.Optional[np.ndarray] = None,
+        dtype: typing.Optional[typing.Union[str, type, np.dtype]] = None,
+    ) -> np.ndarray:
+        """Put values in [0, max_norm] or [-max_norm, max_norm].
+
+        Computation is done in dtype (e.g., float16), which defaults to the dtype of mel_db.
+        """
+        # Shift and scale are folded into a single multiply-add
         if self.symmetric_norm:
             # Symmetric norm
-            mel_norm = ((2 * self.max_norm) * mel_norm) - self.max_norm
-            if self.clip_norm:
-                mel_norm = np.clip(mel_norm, -self.max_norm, self.max_norm)
+            scale = (2 * self.max_norm) / -self.min_level_db
+            min_norm = -self.max_norm
         else:
             # Asymmetric norm
-            mel_norm = self.max_norm * mel_norm
-            if self.clip_norm:
-                mel_norm = np.clip(mel_norm, 0, self.max_norm)
+            scale = self.max_norm / -self.min_level_db
+            min_norm = 0
+
+        bias = (-self.ref_level_db - self.min_level_db) * scale + min_norm
+
+        mel_norm = np.multiply(mel_db, scale, out=out, dtype=dtype)
+        mel_norm += bias
+
+        if self.clip_norm:
+            np.clip(mel_norm, min_norm, self.max_norm, out=mel_norm)
 
         return mel_norm
 
-    def denormalize(self, mel_db: np.ndarray) -> np.ndarray:
-        """Pull values out of [0, max_norm] or [-max_norm, max_norm]"""
+    def denormalize(
+        self,
+        mel_db: np.ndarray,
+        out: typing.Optional[np.ndarray] = None,
+        dtype: typing.Optional[typing.Union[str, type, np.dtype]] = None,
+    ) -> np.ndarray:
+        """Pull values out of [0, max_norm] or [-max_norm, max_norm].
+
+        Computation is done in dtype (e.g., float16), which defaults to the dtype of mel_db.
+        """
         if self.symmetric_norm:
             # Symmetric norm
-            if self.clip_norm:
-                mel_denorm = np.clip(mel_db, -self.max_norm, self.max_norm)
-
-            mel_denorm = (
-                (mel_denorm + self.max_norm) * -self.min_level_db / (2 * self.max_norm)
-            ) + self.min_level_db
+            scale = -self.min_level_db / (2 * self.max_norm)
+            min_norm = -self.max_norm
         else:
             # Asymmetric norm
-            if self.clip_norm:
-                mel_denorm = np.clip(mel_db, 0, self.max_norm)
-
-            mel_denorm = (
-                mel_denorm * -self.min_level_db / self.max_norm
-            ) + self.min_level_db
+            scale = -self.min_level_db / self.max_norm
+            min_norm = 0
+
+        bias = (-min_norm * scale) + self.min_level_db + self.ref_level_db
+
+        mel_denorm = out
+        if mel_denorm is None:
+            # Same dtype np.multiply would choose
+            mel_denorm = np.empty(
+                mel_db.shape,
+                dtype=dtype if dtype is not None else np.result_type(mel_db, scale),
+            )
+
+        if self.clip_norm:
+            # Clip in place on the typed buffer
+            np.clip(mel_db, min_norm, self.max_norm, out=mel_denorm)
+            mel_denorm *= scale
+        else:
+            np.multiply(mel_db, scale, out=mel_denorm, dtype=dtype)
 
-        mel_denorm += self.ref_level_db
+        mel_denorm += bias
 
         return mel_denorm
 
 
+@_add_slots
 @dataclass
-class ModelConfig(DataClassJsonMixin):
+class ModelConfig(DataClassJSONMixin):
     """TTS model hyperparameters"""
 
     num_symbols: int = 0
@@ -143,8 +205,9 @@ class ModelConfig(DataClassJsonMixin):
         return self.n_speakers > 1
 
 
+@_add_slots
 @dataclass
-class PhonemesConfig(DataClassJsonMixin):
+class PhonemesConfig(DataClassJSONMixin):
     """Phonemes to ids configuration"""
 
     phoneme_separator: str = " "
@@ -179,15 +242,20 @@ class PhonemesConfig(DataClassJsonMixin):
 
     def split_word_phonemes(self, phonemes_str: str) -> typing.List[typing.List[str]]:
         """Split phonemes string into a list of lists (outer is words, inner is individual phonemes in each word)"""
+        phoneme_separator = self.phoneme_separator
+
         return [
-            word_phonemes_str.split(self.phoneme_separator)
+            word_phonemes_str.split(phoneme_separator)
             for word_phonemes_str in phonemes_str.split(self.word_separator)
         ]
 
     def join_word_phonemes(self, word_phonemes: typing.List[typing.List[str]]) -> str:
-        """Split phonemes string into a list of lists (outer is words, inner is individual phonemes in each word)"""
+        """Join a list of lists (outer is words, inner is individual phonemes in each word) into a phonemes string"""
+        phoneme_separator = self.phoneme_separator
+
+        # str.join is faster with a list than a generator
         return self.word_separator.join(
-            self.phoneme_separator.join(wp) for wp in word_phonemes
+            [phoneme_separator.join(wp) for wp in word_phonemes]
         )
 
 
@@ -222,6 +290,7 @@ class MetadataFormat(str, Enum):
     PHONEME_IDS = "ids"
 
 
+@_add_slots
 @dataclass
 class DatasetConfig:
     """Training dataset configuration"""
@@ -245,6 +314,7 @@ class DatasetConfig:
         return cache_dir
 
 
+@_add_slots
 @dataclass
 class AlignerConfig:
     """Text/audio alignment configuration"""
@@ -253,6 +323,7 @@ class AlignerConfig:
     casing: typing.Optional[TextCasing] = None
 
 
+@_add_slots
 @dataclass
 class InferenceConfig:
     """Inference configuration"""
@@ -271,8 +342,9 @@ class InferenceConfig:
     """Automatically append text to the end of an utterance if not present (e.g., punctuation)"""
 
 
+@_add_slots
 @dataclass
-class TrainingConfig(DataClassJsonMixin):
+class TrainingConfig(DataClassJSONMixin):
     """Master configuration for training"""
 
     seed: int = 1234
@@ -324,15 +396,20 @@ class TrainingConfig(DataClassJsonMixin):
     @staticmethod
     def load(config_file: typing.TextIO) -> "TrainingConfig":
         """Load config from a JSON file"""
-        return TrainingConfig.from_json(config_file.read())
+        return TrainingConfig.from_dict(_load_json(config_file))
 
     @staticmethod
     def load_and_merge(
-        config: "TrainingConfig",
+        config: typing.Union["TrainingConfig", typing.Dict[str, typing.Any]],
         config_files: typing.Iterable[typing.Union[str, Path, typing.TextIO]],
     ) -> "TrainingConfig":
         """Loads one or more JSON configuration files and overlays them on top of an existing config"""
-        base_dict = config.to_dict()
+        # Merge raw dicts and only convert back to a dataclass once at the end
+        if isinstance(config, TrainingConfig):
+            base_dict = config.to_dict()
+        else:
+            base_dict = copy.deepcopy(config)
+
         for maybe_config_file in config_files:
             if isinstance(maybe_config_file, (str, Path)):
                 # File path
@@ -343,7 +420,7 @@ class TrainingConfig(DataClassJsonMixin):
 
             with config_file:
                 # Load new config and overlay on existing config
-                new_dict = json.load(config_file)
+                new_dict = _load_json(config_file)
                 TrainingConfig.recursive_update(base_dict, new_dict)
 
         return TrainingConfig.from_dict(base_dict)
@@ -354,10 +431,22 @@ class TrainingConfig(DataClassJsonMixin):
         new_dict: typing.Mapping[typing.Any, typing.Any],
     ) -> None:
         """Recursively overwrites values in base dictionary with values from new dictionary"""
-        for key, value in new_dict.items():
-            if isinstance(value, collections.Mapping) and (
-                base_dict.get(key) is not None
-            ):
-                TrainingConfig.recursive_update(base_dict[key], value)
-            else:
-                base_dict[key] = value
+        # Explicit stack instead of recursion
+        dicts_to_update = [(base_dict, new_dict)]
+        while dicts_to_update:
+            base_dict, new_dict = dicts_to_update.pop()
+            for key, value in new_dict.items():
+                if isinstance(value, Mapping) and isinstance(
+                    base_dict.get(key), MutableMapping
+                ):
+                    dicts_to_update.append((base_dict[key], value))
+                else:
+                    base_dict[key] = value
+
+
+def _load_json(config_file: typing.TextIO) -> typing.Any:
+    """Load JSON from a file with orjson, if available"""
+    if orjson is not None:
+        return orjson.loads(config_file.read())
+
+    return json.load(config_file)
@@ -15,18 +15,20 @@
 #
 """A command-line tool for downloading Mimic 3 voices"""
 import argparse
-import itertools
+import functools
 import json
 import logging
+import os
 import re
+import shutil
 import sys
+import threading
 import typing
-import urllib.request
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from pathlib import Path
-from urllib.error import HTTPError
 
-from ._resources import _PACKAGE, _VOICES
+from ._resources import _ALIAS_TO_KEY, _PACKAGE, _VOICES
 from .const import DEFAULT_VOICES_DOWNLOAD_DIR, DEFAULT_VOICES_URL_FORMAT
 from .utils import WILDCARD, file_sha256_sum, wildcard_to_regex
 
@@ -48,22 +50,76 @@ class VoiceFile:
     sha256_sum: typing.Optional[str] = None
 
 
+@functools.lru_cache(maxsize=None)
+def get_voice_files(voice_key: str) -> typing.Tuple[VoiceFile, ...]:
+    """Get files for a known voice from voices.json (cached)"""
+    return tuple(
+        VoiceFile(
+            file_key,
+            size_bytes=file_info.get("size_bytes"),
+            sha256_sum=file_info.get("sha256_sum"),
+        )
+        for file_key, file_info in _VOICES[voice_key]["files"].items()
+    )
+
+
+def parse_version(version: str) -> typing.Tuple[int, ...]:
+    """Parse version into a tuple that compares correctly (1.0 is the same as 1)"""
+    parts = [int(n) for n in version.split(".")]
+
+    # Trailing zeros don't matter
+    while parts and (parts[-1] == 0):
+        parts.pop()
+
+    return tuple(parts)
+
+
 def is_later_version(version1: str, version2: str) -> bool:
     """True if version1 is later than version2"""
-    v1_parts = [int(n) for n in version1.split(".")]
-    v2_parts = [int(n) for n in version2.split(".")]
+    return parse_version(version1) > parse_version(version2)
+
+
+_CONTENT_RANGE = re.compile(r"^\s*bytes\s+(\d+)-\d+/(\d+|\*)\s*$", re.IGNORECASE)
+
+
+def _get_range_validator(headers: typing.Mapping[str, str]) -> typing.Optional[str]:
+    """Get a validator usable with If-Range (strong ETag or Last-Modified)"""
+    etag = headers.get("etag")
+    if etag and (not etag.startswith("W/")):
+        return etag
+
+    return headers.get("last-modified")
+
 
-    for p1, p2 in itertools.zip_longest(v1_parts, v2_parts, fillvalue=0):
-        if p1 > p2:
-            # 2.0 vs 1.0
-            return True
+def _get_range_start(headers: typing.Mapping[str, str]) -> typing.Optional[int]:
+    """Get first byte position from Content-Range header"""
+    match = _CONTENT_RANGE.match(headers.get("content-range", ""))
+    return int(match.group(1)) if match else None
 
-        if p1 < p2:
-            # 1.0 vs 2.0
-            return False
 
-    # 1.0 vs 1.0
-    return False
+def _get_range_total(headers: typing.Mapping[str, str]) -> typing.Optional[int]:
+    """Get complete file size from Content-Range header"""
+    match = _CONTENT_RANGE.match(headers.get("content-range", ""))
+    if (not match) or (match.group(2) == "*"):
+        return None
+
+    return int(match.group(2))
+
+
+class _ProgressReader:
+    """Wraps a file object and reports bytes read to a progress bar"""
+
+    def __init__(self, fp: typing.BinaryIO, pbar, pbar_lock: threading.Lock):
+        self.fp = fp
+        self.pbar = pbar
+        self.pbar_lock = pbar_lock
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.fp.read(size)
+        with self.pbar_lock:
+            self.pbar.update(len(data))
+
+        return data
 
 
 def download_voice(
@@ -72,11 +128,14 @@ def download_voice(
     voice_files: typing.Iterable[VoiceFile],
     voice_version: str,
     voices_dir: typing.Optional[typing.Union[str, Path]] = None,
-    chunk_bytes: int = 4096,
+    chunk_bytes: int = 1024 * 1024,
     redownload: bool = False,
+    max_workers: int = 8,
 ):
     """Downloads a voice to a directory"""
-    from tqdm.auto import tqdm
+    import requests
+    from requests.adapters import HTTPAdapter
+    from tqdm import tqdm
 
     if url_base.endswith("/"):
         # Remove final slash
@@ -100,46 +159,154 @@ def download_voice(
                 voice_version,
             )
 
-    for voice_file in voice_files:
-        file_url = f"{url_base}/{voice_file.relative_path}"
-        file_path = voice_dir / voice_file.relative_path
-        file_path.parent.mkdir(parents=True, exist_ok=True)
-
-        if (not redownload) and voice_file.sha256_sum and file_path.is_file():
-            # Check if file exists and has correct sha256
-            expected_sha256 = voice_file.sha256_sum
-
-            with open(file_path, "rb") as check_file:
-                actual_sha256 = file_sha256_sum(check_file)
-
-            if actual_sha256 == expected_sha256:
-                _LOGGER.debug("Skipping download of %s (sha256 match)", file_path)
-                continue
-
-        try:
-            # Download file, show progress with tqdm
-            with urllib.request.urlopen(file_url) as response:
-                with open(file_path, mode="wb") as dest_file:
-                    with tqdm(
-                        unit="B",
-                        unit_scale=True,
-                        unit_divisor=1024,
-                        miniters=1,
-                        desc=voice_file.relative_path,
-                        total=int(response.headers.get("content-length", 0)),
-                    ) as pbar:
-                        chunk = response.read(chunk_bytes)
-                        while chunk:
-                            dest_file.write(chunk)
-                            pbar.update(len(chunk))
-                            chunk = response.read(chunk_bytes)
-
-            _LOGGER.debug("Downloaded %s", file_path)
-        except HTTPError as e:
-            _LOGGER.exception("download_voice")
-            raise VoiceDownloadError(
-                f"Failed to download file for voice {voice_key} from {file_url}: {e}"
-            ) from e
+    # Files are downloaded concurrently over kept-alive connections, and share a
+    # single progress bar.
+    session = requests.Session()
+    session.mount("https://", HTTPAdapter(pool_maxsize=max_workers))
+    session.mount("http://", HTTPAdapter(pool_maxsize=max_workers))
+    pbar_lock = threading.Lock()
+
+    with session, tqdm(
+        unit="B",
+        unit_scale=True,
+        unit_divisor=1024,
+        mininterval=0.5,
+        desc=voice_key,
+        total=0,
+        disable=not sys.stderr.isatty(),
+    ) as pbar:
+
+        def download_file(voice_file: VoiceFile):
+            file_url = f"{url_base}/{voice_file.relative_path}"
+            file_path = voice_dir / voice_file.relative_path
+            file_path.parent.mkdir(parents=True, exist_ok=True)
+
+            if (not redownload) and voice_file.sha256_sum and file_path.is_file():
+                if (voice_file.size_bytes is not None) and (
+                    file_path.stat().st_size != voice_file.size_bytes
+                ):
+                    # Wrong size, so sha256 can't match
+                    _LOGGER.debug("Size mismatch for %s", file_path)
+                else:
+                    # Check if file exists and has correct sha256
+                    expected_sha256 = voice_file.sha256_sum
+
+                    with open(file_path, "rb") as check_file:
+                        actual_sha256 = file_sha256_sum(check_file)
+
+                    if actual_sha256 == expected_sha256:
+                        _LOGGER.debug(
+                            "Skipping download of %s (sha256 match)", file_path
+                        )
+                        return
+
+            # Incomplete downloads are kept here so they can be resumed.
+            # The validator (ETag/Last-Modified) of the partial file is stored
+            # alongside it, so a changed file on the server is not appended to.
+            part_path = file_path.with_name(file_path.name + ".part")
+            validator_path = part_path.with_name(part_path.name + ".validator")
+            if redownload:
+                for stale_path in (part_path, validator_path):
+                    if stale_path.is_file():
+                        stale_path.unlink()
+
+            offset = 0
+            validator: typing.Optional[str] = None
+            if part_path.is_file() and validator_path.is_file():
+                offset = part_path.stat().st_size
+                validator = validator_path.read_text(encoding="utf-8").strip()
+
+            try:
+                # Download file, show progress with tqdm
+                headers: typing.Dict[str, str] = {}
+                if (offset > 0) and validator:
+                    # Only get the rest of the file (without compression) if it
+                    # hasn't changed since the partial download.
+                    headers["Range"] = f"bytes={offset}-"
+                    headers["If-Range"] = validator
+                    headers["Accept-Encoding"] = "identity"
+
+                response = session.get(file_url, stream=True, headers=headers)
+                if headers and (
+                    (response.status_code == 416)
+                    or (
+                        (response.status_code == 206)
+                        and (_get_range_start(response.headers) != offset)
+                    )
+                ):
+                    # Range not satisfiable or not what we asked for, so start over
+                    response.close()
+                    response = session.get(file_url, stream=True)
+
+                with response:
+                    response.raise_for_status()
+
+                    expected_size: typing.Optional[int] = None
+                    if response.status_code == 206:
+                        _LOGGER.debug("Resuming %s at byte %s", file_path, offset)
+                        expected_size = _get_range_total(response.headers)
+                    else:
+                        # Server sent the whole file
+                        offset = 0
+                        if response.headers.get(
+                            "content-encoding", "identity"
+                        ) == "identity" and ("content-length" in response.headers):
+                            expected_size = int(response.headers["content-length"])
+
+                        new_validator = _get_range_validator(response.headers)
+                        if new_validator:
+                            validator_path.write_text(new_validator, encoding="utf-8")
+                        elif validator_path.is_file():
+                            validator_path.unlink()
+
+                    with pbar_lock:
+                        pbar.total += int(response.headers.get("content-length", 0))
+                        pbar.refresh()
+
+                    # Undo gzip, etc. like iter_content would
+                    response.raw.decode_content = True
+                    source_file: typing.Union[
+                        typing.BinaryIO, _ProgressReader
+                    ] = response.raw
+                    if not pbar.disable:
+                        source_file = _ProgressReader(response.raw, pbar, pbar_lock)
+
+                    with open(
+                        part_path, mode="ab" if offset > 0 else "wb"
+                    ) as dest_file:
+                        shutil.copyfileobj(source_file, dest_file, length=chunk_bytes)
+
+                actual_size = part_path.stat().st_size
+                if (expected_size is not None) and (actual_size != expected_size):
+                    # Partial file is unusable, so don't resume from it
+                    part_path.unlink()
+                    if validator_path.is_file():
+                        validator_path.unlink()
+
+                    raise VoiceDownloadError(
+                        f"Size mismatch for {file_path} from {file_url}: "
+                        f"expected {expected_size} byte(s), got {actual_size}"
+                    )
+
+                os.replace(part_path, file_path)
+                if validator_path.is_file():
+                    validator_path.unlink()
+
+                _LOGGER.debug("Downloaded %s", file_path)
+            except requests.HTTPError as e:
+                _LOGGER.exception("download_voice")
+                raise VoiceDownloadError(
+                    f"Failed to download file for voice {voice_key} from {file_url}: {e}"
+                ) from e
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(download_file, voice_file) for voice_file in voice_files
+            ]
+
+            for future in futures:
+                # Propagate errors
+                future.result()
 
 
 def is_voice_downloaded(voice_location: str) -> bool:
@@ -207,23 +374,12 @@ def main(argv=None):
     for key_or_pattern in args.key:
         if isinstance(key_or_pattern, re.Pattern):
             # Wildcards
-            voice_keys = []
-            for maybe_key in _VOICES.keys():
-                if key_or_pattern.match(maybe_key):
-                    voice_keys.append(maybe_key)
-
+            voice_keys = list(filter(key_or_pattern.match, _VOICES))
             _LOGGER.debug("%s matched %s", key_or_pattern, voice_keys)
         else:
             # No wildcards.
             # Resolve aliases.
-            for maybe_key, maybe_info in _VOICES.items():
-                for alias in maybe_info.get("aliases", []):
-                    if key_or_pattern == alias:
-                        # Alias match
-                        key_or_pattern = maybe_key
-                        break
-
-            voice_keys = [key_or_pattern]
+            voice_keys = [_ALIAS_TO_KEY.get(key_or_pattern, key_or_pattern)]
 
         for voice_key in voice_keys:
             if "/" not in voice_key:
@@ -237,16 +393,12 @@ def main(argv=None):
             voice_url = str.format(
                 args.url_format, key=voice_key, lang=voice_lang, name=voice_name
             )
-            voice_files = voice_info["files"]
 
             _LOGGER.info("Downloading %s", voice_key)
             download_voice(
                 voice_key=voice_key,
                 url_base=voice_url,
-                voice_files=[
-                    VoiceFile(file_key, sha256_sum=file_info.get("sha256_sum"))
-                    for file_key, file_info in voice_files.items()
-                ],
+                voice_files=get_voice_files(voice_key),
                 voice_version=voice_info["version"],
                 voices_dir=args.output_dir,
                 redownload=args.redownload,
@@ -14,16 +14,20 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #
 """Implementation of OpenTTS for Mimic 3"""
-import audioop
+import bisect
+import contextlib
+import functools
 import itertools
 import logging
-import re
+import os
+import threading
 import typing
-from copy import deepcopy
+from collections import OrderedDict, defaultdict
+from copy import copy
 from dataclasses import dataclass, field
 from pathlib import Path
 
-from gruut_ipa import IPA
+import numpy as np
 from xdgenvpy import XDG
 
 from opentts_abc import (
@@ -73,7 +77,7 @@ class Mimic3Settings:
     """Default language (e.g., "en_US")"""
 
     voices_directories: typing.Optional[typing.Iterable[typing.Union[str, Path]]] = None
-    """Directories to search for voices (<lang>/<voice>)"""
+    """Directories to search for voices (<lang>/<voice>), stored as a tuple of paths"""
 
     voices_url_format: typing.Optional[str] = DEFAULT_VOICES_URL_FORMAT
     """URL format string for a voice directory.
@@ -123,6 +127,26 @@ class Mimic3Settings:
     use_deterministic_compute: bool = False
     """Force onnxruntime to use deterministic compute mode. For fully deterministic synthesis, also set noise_scale and noise_w to 0."""
 
+    onnx_intra_op_threads: typing.Optional[int] = None
+    """Number of threads used within each Onnx operator (onnxruntime default if None)"""
+
+    prefer_quantized: bool = True
+    """Use generator.int8.onnx instead of generator.onnx if it's in the voice directory"""
+
+    serialize_inference: bool = False
+    """Only run one Onnx inference at a time across all threads (inference is always serialized when use_cuda is set)"""
+
+    utterance_cache_size: int = 0
+    """Number of synthesized utterances to keep for repeated text (0 to disable).
+
+    Cached audio is reused as-is, so noise is not re-sampled for repeated text.
+    """
+
+    def __post_init__(self):
+        if self.voices_directories is not None:
+            # Immutable, so copies of settings can share it
+            self.voices_directories = tuple(map(Path, self.voices_directories))
+
 
 @dataclass
 class Mimic3Phonemes:
@@ -145,18 +169,100 @@ class VoiceNotFoundError(Exception):
         super().__init__(f"Voice not found: {voice}")
 
 
+# Sorted for prefix search with bisect
+_SORTED_VOICE_KEYS: typing.Tuple[str, ...] = tuple(sorted(_VOICES.keys()))
+
+
+@functools.lru_cache(maxsize=64)
+def _match_voice_keys(voice_key: str) -> typing.Tuple[str, ...]:
+    """Get known voice keys that match a key with wildcards (*)"""
+    if voice_key.endswith(WILDCARD) and (voice_key.count(WILDCARD) == 1):
+        # Prefix only (e.g., en_US/*)
+        prefix = voice_key[: -len(WILDCARD)]
+        start_idx = bisect.bisect_left(_SORTED_VOICE_KEYS, prefix)
+        matching_keys = []
+        for maybe_key in itertools.islice(_SORTED_VOICE_KEYS, start_idx, None):
+            if not maybe_key.startswith(prefix):
+                break
+
+            matching_keys.append(maybe_key)
+
+        return tuple(matching_keys)
+
+    pattern = wildcard_to_regex(voice_key, wildcard=WILDCARD)
+
+    return tuple(filter(pattern.match, _SORTED_VOICE_KEYS))
+
+
+@functools.lru_cache(maxsize=4096)
+def _ipa_graphemes(phoneme_str: str) -> typing.Tuple[str, ...]:
+    """Split IPA string into graphemes (cached for repeated phonemes)"""
+    from gruut_ipa import IPA
+
+    return tuple(IPA.graphemes(phoneme_str))
+
+
+@functools.lru_cache(maxsize=128)
+def _load_config(config_path: str, mtime_ns: int) -> TrainingConfig:
+    """Load voice config (cached by path and modification time)"""
+    _LOGGER.debug("Loading config from %s", config_path)
+
+    with open(config_path, "r", encoding="utf-8") as config_file:
+        return TrainingConfig.load(config_file)
+
+
+def _list_subdirs(dir_path: Path) -> typing.List[Path]:
+    """List non-hidden sub-directories.
+
+    Uses os.scandir, which usually knows if an entry is a directory without an
+    extra stat call.
+    """
+    with os.scandir(dir_path) as entries:
+        return [
+            Path(entry.path)
+            for entry in entries
+            if (not entry.name.startswith(".")) and entry.is_dir()
+        ]
+
+
+def _read_nonempty_lines(path: Path) -> typing.List[str]:
+    """Read stripped, non-empty lines from a text file"""
+    lines = (line.strip() for line in path.read_text(encoding="utf-8").splitlines())
+
+    return [line for line in lines if line]
+
+
+@functools.lru_cache(maxsize=32)
+def _silence_bytes(time_ms: float, sample_rate: int) -> bytes:
+    """Get 16-bit mono silence, shared between breaks of the same length"""
+    num_samples = int((time_ms / 1000.0) * sample_rate)
+
+    return bytes(num_samples * 2)
+
+
 # -----------------------------------------------------------------------------
 
 
 class Mimic3TextToSpeechSystem(TextToSpeechSystem):
     """Convert text to speech using Mimic 3"""
 
+    # Shared by all instances, since Onnx models are shared between threads
+    _INFERENCE_LOCK = threading.Lock()
+
     def __init__(self, settings: Mimic3Settings):
         self.settings = settings
 
         self._results: typing.List[typing.Union[BaseResult, Mimic3Phonemes]] = []
         self._loaded_voices: typing.Dict[str, Mimic3Voice] = {}
 
+        # key/alias -> voices (in search order), built lazily from get_voices
+        self._voice_index: typing.Optional[typing.Dict[str, typing.List[Voice]]] = None
+
+        # (voice, phoneme ids, speaker, scales, rate) -> audio (before volume)
+        self._utterance_cache: "OrderedDict[typing.Hashable, np.ndarray]" = (
+            OrderedDict()
+        )
+
     @staticmethod
     def get_default_voices_directories() -> typing.List[Path]:
         """Get list of directories to search for voices by default.
@@ -180,7 +286,8 @@ class Mimic3TextToSpeechSystem(TextToSpeechSystem):
         if self.settings.voices_directories is not None:
             voices_dirs = itertools.chain(self.settings.voices_directories, voices_dirs)
 
-        known_voices = set(_VOICES.keys())
+        # Keys of voices found locally
+        found_voices: typing.Set[str] = set()
 
         # voices/<language>/<voice>/
         for voices_dir in voices_dirs:
@@ -192,14 +299,8 @@ class Mimic3TextToSpeechSystem(TextToSpeechSystem):
 
             _LOGGER.debug("Searching %s for voices", voices_dir)
 
-            for lang_dir in voices_dir.iterdir():
-                if not lang_dir.is_dir() or lang_dir.name.startswith("."):
-                    continue
-
-                for voice_dir in lang_dir.iterdir():
-                    if not voice_dir.is_dir() or voice_dir.name.startswith("."):
-                        continue
-
+            for lang_dir in _list_subdirs(voices_dir):
+                for voice_dir in _list_subdirs(lang_dir):
                     config_path = voice_dir / "config.json"
                     if not config_path.is_file():
                         continue
@@ -207,11 +308,10 @@ class Mimic3TextToSpeechSystem(TextToSpeechSystem):
                     _LOGGER.debug("Voice found in %s", voice_dir)
                     voice_lang = lang_dir.name
 
-                    # Load config
-                    _LOGGER.debug("Loading config from %s", config_path)
-
-                    with open(config_path, "r", encoding="utf-8") as config_file:
-                        config = TrainingConfig.load(config_file)
+                    # Load config (cached until file changes)
+                    config = _load_config(
+                        str(config_path), config_path.stat().st_mtime_ns
+                    )
 
                     properties: typing.Dict[str, typing.Any] = {
                         "length_scale": config.inference.length_scale,
@@ -225,26 +325,13 @@ class Mimic3TextToSpeechSystem(TextToSpeechSystem):
 
                     speakers_path = voice_dir / "speakers.txt"
                     if speakers_path.is_file():
-                        speakers = []
-                        with open(
-                            speakers_path, "r", encoding="utf-8"
-                        ) as speakers_file:
-                            for line in speakers_file:
-                                line = line.strip()
-                                if line:
-                                    speakers.append(line)
+                        speakers = _read_nonempty_lines(speakers_path)
 
                     # Load aliases
                     aliases: typing.Optional[typing.Set[str]] = None
                     aliases_path = voice_dir / "ALIASES"
                     if aliases_path.is_file():
-                        aliases = set()
-
-                        with open(aliases_path, "r", encoding="utf-8") as aliases_file:
-                            for line in aliases_file:
-                                line = line.strip()
-                                if line:
-                                    aliases.add(line)
+                        aliases = set(_read_nonempty_lines(aliases_path))
 
                     voice_key = f"{voice_lang}/{voice_name}"
 
@@ -259,10 +346,13 @@ class Mimic3TextToSpeechSystem(TextToSpeechSystem):
                         aliases=aliases,
                     )
 
-                    known_voices.discard(voice_key)
+                    found_voices.add(voice_key)
 
         # Yield voices that haven't yet been downloaded
-        for voice_key in known_voices:
+        for voice_key in _SORTED_VOICE_KEYS:
+            if voice_key in found_voices:
+                continue
+
             voice_lang, voice_name = voice_key.split("/", maxsplit=1)
             voice_info = _VOICES.get(voice_key, {})
             speakers = voice_info.get("speakers", [])
@@ -288,23 +378,12 @@ class Mimic3TextToSpeechSystem(TextToSpeechSystem):
 
         Voice key may contain wildcards (*).
         """
-        voice_keys = []
+        voice_keys: typing.Sequence[str] = [voice_key]
 
         if WILDCARD in voice_key:
-            key_or_pattern = wildcard_to_regex(voice_key, wildcard=WILDCARD)
-            if isinstance(key_or_pattern, re.Pattern):
-                # Wildcards
-                for maybe_key in _VOICES.keys():
-                    if key_or_pattern.match(maybe_key):
-                        voice_keys.append(maybe_key)
-
-                _LOGGER.debug("%s matched %s", key_or_pattern, voice_keys)
-            else:
-                # Didn't contain wildcards
-                voice_keys.append(voice_key)
-        else:
-            # No wildcards
-            voice_keys.append(voice_key)
+            # Wildcards
+            voice_keys = _match_voice_keys(voice_key)
+            _LOGGER.debug("%s matched %s", voice_key, voice_keys)
 
         for key_to_load in voice_keys:
             self._get_or_load_voice(key_to_load)
@@ -376,6 +455,10 @@ class Mimic3TextToSpeechSystem(TextToSpeechSystem):
         minor_break_ms = voice.config.inference.minor_break_ms
         major_break_ms = voice.config.inference.major_break_ms
 
+        # Settings can't change during this call, so all chunks share a snapshot.
+        # Fields are only ever reassigned, so a shallow copy is enough.
+        current_settings = copy(self.settings)
+
         # Process chunks
         for sent_phonemes, break_type in voice.text_to_phonemes(
             text, text_language=text_language
@@ -396,7 +479,7 @@ class Mimic3TextToSpeechSystem(TextToSpeechSystem):
 
             self._results.append(
                 Mimic3Phonemes(
-                    current_settings=deepcopy(self.settings),
+                    current_settings=current_settings,
                     phonemes=sent_phonemes,
                     is_utterance=is_utterance,
                 )
@@ -430,7 +513,7 @@ class Mimic3TextToSpeechSystem(TextToSpeechSystem):
                 if " " in phoneme_str:
                     token_phonemes.append(phoneme_str.split())
                 else:
-                    token_phonemes.append(list(IPA.graphemes(phoneme_str)))
+                    token_phonemes.append(list(_ipa_graphemes(phoneme_str)))
             elif isinstance(token, SayAs):
                 say_as_phonemes = voice.say_as_to_phonemes(
                     token.text,
@@ -443,7 +526,7 @@ class Mimic3TextToSpeechSystem(TextToSpeechSystem):
         if token_phonemes:
             self._results.append(
                 Mimic3Phonemes(
-                    current_settings=deepcopy(self.settings),
+                    current_settings=copy(self.settings),
                     phonemes=token_phonemes,
                     is_utterance=False,
                 )
@@ -451,8 +534,7 @@ class Mimic3TextToSpeechSystem(TextToSpeechSystem):
 
     def add_break(self, time_ms: int):
         # Generate silence (16-bit mono at sample rate)
-        num_samples = int((time_ms / 1000.0) * self.settings.sample_rate)
-        audio_bytes = bytes(num_samples * 2)
+        audio_bytes = _silence_bytes(time_ms, self.settings.sample_rate)
 
         self._results.append(
             AudioResult(
@@ -468,6 +550,24 @@ class Mimic3TextToSpeechSystem(TextToSpeechSystem):
         self._results.append(MarkResult(name=name))
 
     def end_utterance(self) -> typing.Iterable[BaseResult]:
+        if len(self._results) == 1:
+            # Fast path for a single sentence, mark, etc.
+            # Settings are chosen exactly as in the loop below: an utterance is
+            # spoken before last_settings is set, so it uses the live settings.
+            result = self._results.pop()
+            if isinstance(result, Mimic3Phonemes):
+                if result.phonemes:
+                    yield self._speak_sentence_phonemes(
+                        result.phonemes,
+                        settings=(
+                            None if result.is_utterance else result.current_settings
+                        ),
+                    )
+            else:
+                yield result
+
+            return
+
         last_settings: typing.Optional[Mimic3Settings] = None
         sent_phonemes: PHONEMES_LIST_TYPE = []
 
@@ -528,19 +628,56 @@ class Mimic3TextToSpeechSystem(TextToSpeechSystem):
 
         _LOGGER.debug("phonemes=%s, ids=%s", sent_phonemes, sent_phoneme_ids)
 
-        audio = voice.ids_to_audio(
-            sent_phoneme_ids,
-            speaker=settings.speaker,
-            length_scale=settings.length_scale,
-            noise_scale=settings.noise_scale,
-            noise_w=settings.noise_w,
-            rate=settings.rate,
-        )
+        audio: typing.Optional[np.ndarray] = None
+        cache_key: typing.Optional[typing.Hashable] = None
+        if settings.utterance_cache_size > 0:
+            cache_key = (
+                settings.voice or self.voice,
+                tuple(sent_phoneme_ids),
+                settings.speaker,
+                settings.length_scale,
+                settings.noise_scale,
+                settings.noise_w,
+                settings.rate,
+            )
+            audio = self._utterance_cache.get(cache_key)
+            if audio is not None:
+                _LOGGER.debug("Using cached audio")
+                self._utterance_cache.move_to_end(cache_key)
+
+        if audio is None:
+            if settings.serialize_inference or settings.use_cuda:
+                inference_lock: typing.ContextManager = (
+                    Mimic3TextToSpeechSystem._INFERENCE_LOCK
+                )
+            else:
+                inference_lock = contextlib.nullcontext()
+
+            with inference_lock:
+                audio = voice.ids_to_audio(
+                    sent_phoneme_ids,
+                    speaker=settings.speaker,
+                    length_scale=settings.length_scale,
+                    noise_scale=settings.noise_scale,
+                    noise_w=settings.noise_w,
+                    rate=settings.rate,
+                )
 
-        audio_bytes = audio.tobytes()
+            if cache_key is not None:
+                # Shared between results, so must not be modified
+                audio.flags.writeable = False
+                self._utterance_cache[cache_key] = audio
+                while len(self._utterance_cache) > settings.utterance_cache_size:
+                    self._utterance_cache.popitem(last=False)
 
         if settings.volume != DEFAULT_VOLUME:
-            audio_bytes = audioop.mul(audio_bytes, 2, settings.volume / 100.0)
+            # Same as audioop.mul: scale, saturate, and round down
+            scaled_audio = np.multiply(audio, settings.volume / 100.0)
+            np.clip(scaled_audio, -32768, 32767, out=scaled_audio)
+            np.floor(scaled_audio, out=scaled_audio)
+            audio_bytes = scaled_audio.astype(np.int16).tobytes()
+        else:
+            audio_bytes = audio.tobytes()
 
         return AudioResult(
             sample_rate_hz=voice.config.audio.sample_rate,
@@ -556,22 +693,27 @@ class Mimic3TextToSpeechSystem(TextToSpeechSystem):
         if existing_voice is not None:
             return existing_voice
 
-        # Look up as substring of known voice
+        # Look up by key or alias of known voice
         model_dir: typing.Optional[Path] = None
-        for maybe_voice in self.get_voices():
-            if (voice_key == maybe_voice.key) or (
-                maybe_voice.aliases and (voice_key in maybe_voice.aliases)
-            ):
-                maybe_model_dir = Path(maybe_voice.location)
+        candidate_voices = self._find_voices(voice_key)
+
+        # Prefer a voice that's already on disk
+        for maybe_voice in candidate_voices:
+            maybe_model_dir = Path(maybe_voice.location)
+            if maybe_model_dir.is_dir():
+                model_dir = maybe_model_dir
+                break
 
-                if (not maybe_model_dir.is_dir()) and (not self.settings.no_download):
-                    # Download voice
-                    maybe_model_dir = self._download_voice(voice_key)
+        download_keys = [v.key for v in candidate_voices if v.key in _VOICES]
+        if (model_dir is None) and download_keys and (not self.settings.no_download):
+            # Download voice (by its key, since voice_key may be an alias)
+            maybe_model_dir = self._download_voice(download_keys[0])
 
-                if maybe_model_dir.is_dir():
-                    # Voice found
-                    model_dir = maybe_model_dir
-                    break
+            # Voice locations have changed
+            self._voice_index = None
+
+            if maybe_model_dir.is_dir():
+                model_dir = maybe_model_dir
 
         if model_dir is None:
             raise VoiceNotFoundError(voice_key)
@@ -597,6 +739,8 @@ class Mimic3TextToSpeechSystem(TextToSpeechSystem):
             providers=providers,
             share_models=self.settings.share_onnx_models_between_threads,
             use_deterministic_compute=self.settings.use_deterministic_compute,
+            intra_op_num_threads=self.settings.onnx_intra_op_threads,
+            prefer_quantized=self.settings.prefer_quantized,
         )
 
         _LOGGER.info("Loaded voice from %s", model_dir)
@@ -607,6 +751,29 @@ class Mimic3TextToSpeechSystem(TextToSpeechSystem):
 
         return voice
 
+    def _find_voices(self, voice_key: str) -> typing.List[Voice]:
+        """Get voices matching a key or alias (in search order)"""
+        # Read once, since another thread may reset the index after a download
+        voice_index = self._voice_index
+        if voice_index is not None:
+            voices = voice_index.get(voice_key)
+            if voices:
+                return voices
+
+        # Voices directories are only scanned again on a miss, in case a voice
+        # was added.
+        new_index: typing.Dict[str, typing.List[Voice]] = defaultdict(list)
+        for voice in self.get_voices():
+            new_index[voice.key].append(voice)
+            for alias in voice.aliases or ():
+                new_index[alias].append(voice)
+
+        # Only publish the index once it's complete
+        voice_index = dict(new_index)
+        self._voice_index = voice_index
+
+        return voice_index.get(voice_key, [])
+
     def _download_voice(self, voice_key: str) -> Path:
         """Downloads a voice by key"""
         voice_lang, voice_name = voice_key.split("/", maxsplit=1)
@@ -14,16 +14,25 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #
 """Utility methods for Mimic 3"""
+import functools
 import hashlib
+import math
 import re
+import struct
 import typing
 import unicodedata
 
-import numpy as np
+if typing.TYPE_CHECKING:
+    # numpy is only imported when audio is converted, so tools like
+    # mimic3-download and remote synthesis start faster.
+    import numpy as np
 
 # Wildcard character for voice keys (e.g., en_US/*)
 WILDCARD = "*"
 
+# Size of WAV audio data when the final size isn't known (streaming)
+WAV_UNKNOWN_SIZE = 0xFFFFFFFF - 36
+
 # Language code to native/English language name
 LANG_NAMES = {
     "bn": ("বাংলা", "Bengali"),
@@ -235,47 +244,87 @@ SAMPLE_SENTENCES = {
 
 
 def audio_float_to_int16(
-    audio: np.ndarray, max_wav_value: float = 32767.0
-) -> np.ndarray:
+    audio: "np.ndarray", max_wav_value: float = 32767.0
+) -> "np.ndarray":
     """Normalize audio and convert to int16 range"""
-    audio_norm = audio * (max_wav_value / max(0.01, np.max(np.abs(audio))))
-    audio_norm = np.clip(audio_norm, -max_wav_value, max_wav_value)
-    audio_norm = audio_norm.astype("int16")
-    return audio_norm
+    import numpy as np
 
+    # Peak of absolute value without an intermediate abs(audio) array
+    audio_min, audio_max = float(audio.min()), float(audio.max())
+    if not (math.isfinite(audio_min) and math.isfinite(audio_max)):
+        # Model output has nan/inf, so use the peak of the finite samples.
+        # nan becomes silence and inf saturates in the clip below.
+        is_finite = np.isfinite(audio)
+        audio_min = float(audio.min(initial=0.0, where=is_finite))
+        audio_max = float(audio.max(initial=0.0, where=is_finite))
+        audio = np.nan_to_num(audio, nan=0.0, posinf=np.inf, neginf=-np.inf)
 
-def wildcard_to_regex(template: str, wildcard: str = "*") -> re.Pattern:
-    """Convert a string with wildcards into a regex pattern"""
-    wildcard_escaped = re.escape(wildcard)
+    peak = max(0.01, -audio_min, audio_max)
+    audio_norm = np.multiply(audio, max_wav_value / peak)
+    np.clip(audio_norm, -max_wav_value, max_wav_value, out=audio_norm)
 
-    pattern_parts = ["^"]
-    for i, template_part in enumerate(re.split(f"({wildcard_escaped})", template)):
-        if (i % 2) == 0:
-            # Fixed string
-            pattern_parts.append(re.escape(template_part))
-        else:
-            # Wildcard separator
-            pattern_parts.append(".*")
+    return audio_norm.astype(np.int16)
 
-    pattern_parts.append("$")
-    pattern_str = "".join(pattern_parts)
 
-    return re.compile(pattern_str)
+@functools.lru_cache(maxsize=1024)
+def wildcard_to_regex(template: str, wildcard: str = "*") -> re.Pattern:
+    """Convert a string with wildcards into a regex pattern (cached)"""
+    # Escape everything, then turn escaped wildcards into .*
+    pattern_str = re.escape(template).replace(re.escape(wildcard), ".*")
 
+    return re.compile(f"^{pattern_str}$")
 
-def file_sha256_sum(fp: typing.BinaryIO, block_bytes: int = 4096) -> str:
+
+def file_sha256_sum(fp: typing.BinaryIO, block_bytes: int = 1024 * 1024) -> str:
     """Return the sha256 sum of a (possibly large) file"""
+    if hasattr(hashlib, "file_digest"):
+        # Python 3.11+ reads and hashes in C without holding the GIL
+        return hashlib.file_digest(fp, "sha256").hexdigest()  # type: ignore
+
     current_hash = hashlib.sha256()
 
-    # Read in blocks in case file is very large
-    block = fp.read(block_bytes)
-    while len(block) > 0:
-        current_hash.update(block)
-        block = fp.read(block_bytes)
+    # Read in blocks in case file is very large, reusing a single buffer
+    block_buffer = bytearray(block_bytes)
+    block_view = memoryview(block_buffer)
+    num_bytes = fp.readinto(block_buffer)  # type: ignore
+    while num_bytes:
+        current_hash.update(block_view[:num_bytes])
+        num_bytes = fp.readinto(block_buffer)  # type: ignore
 
     return current_hash.hexdigest()
 
 
 def to_codepoints(s: str) -> typing.List[str]:
     """Split string into a list of codepoints"""
+    if s.isascii():
+        # ASCII is already normalized
+        return list(s)
+
     return list(unicodedata.normalize("NFC", s))
+
+
+def make_wav_header(
+    sample_rate_hz: int,
+    sample_width_bytes: int,
+    num_channels: int,
+    num_audio_bytes: int,
+) -> bytes:
+    """Create a 44-byte WAV header for raw PCM audio"""
+    frame_bytes = sample_width_bytes * num_channels
+
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF",
+        36 + num_audio_bytes,
+        b"WAVE",
+        b"fmt ",
+        16,  # size of fmt chunk
+        1,  # PCM
+        num_channels,
+        sample_rate_hz,
+        sample_rate_hz * frame_bytes,
+        frame_bytes,
+        sample_width_bytes * 8,
+        b"data",
+        num_audio_bytes,
+    )
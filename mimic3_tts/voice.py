@@ -71,6 +71,9 @@ class Mimic3Voice(metaclass=ABCMeta):
     _SHARED_MODELS: typing.Dict[str, onnxruntime.InferenceSession] = {}
     _SHARED_MODELS_LOCK = threading.Lock()
 
+    # Per-model locks so different models can be loaded in parallel
+    _SHARED_MODEL_LOCKS: typing.Dict[str, threading.Lock] = {}
+
     def __init__(
         self,
         config: TrainingConfig,
@@ -253,8 +256,15 @@ class Mimic3Voice(metaclass=ABCMeta):
         ] = None,
         share_models: bool = True,
         use_deterministic_compute: bool = False,
+        intra_op_num_threads: typing.Optional[int] = None,
+        prefer_quantized: bool = True,
     ) -> "Mimic3Voice":
-        """Load a Mimic 3 voice from a directory"""
+        """Load a Mimic 3 voice from a directory.
+
+        If prefer_quantized is True and the directory contains generator.int8.onnx,
+        it is used instead of generator.onnx. This model can be created with
+        onnxruntime.quantization.quantize_dynamic (int8 weights).
+        """
         voice_dir = Path(voice_dir)
         _LOGGER.debug("Loading voice from %s", voice_dir)
 
@@ -271,12 +281,23 @@ class Mimic3Voice(metaclass=ABCMeta):
             phoneme_to_id = phonemes2ids.load_phoneme_ids(ids_file)
 
         generator_path = voice_dir / "generator.onnx"
+        if prefer_quantized:
+            quantized_path = voice_dir / "generator.int8.onnx"
+            if quantized_path.is_file():
+                _LOGGER.debug("Using quantized model: %s", quantized_path)
+                generator_path = quantized_path
 
         onnx_model: typing.Optional[onnxruntime.InferenceSession] = None
 
         if share_models:
+            model_key = str(generator_path.absolute())
             with Mimic3Voice._SHARED_MODELS_LOCK:
-                model_key = str(generator_path.absolute())
+                model_lock = Mimic3Voice._SHARED_MODEL_LOCKS.get(model_key)
+                if model_lock is None:
+                    model_lock = threading.Lock()
+                    Mimic3Voice._SHARED_MODEL_LOCKS[model_key] = model_lock
+
+            with model_lock:
                 onnx_model = Mimic3Voice._SHARED_MODELS.get(model_key)
 
                 if onnx_model is None:
@@ -285,6 +306,7 @@ class Mimic3Voice(metaclass=ABCMeta):
                         session_options=session_options,
                         providers=providers,
                         use_deterministic_compute=use_deterministic_compute,
+                        intra_op_num_threads=intra_op_num_threads,
                     )
 
                     Mimic3Voice._SHARED_MODELS[model_key] = onnx_model
@@ -296,6 +318,7 @@ class Mimic3Voice(metaclass=ABCMeta):
                 session_options=session_options,
                 providers=providers,
                 use_deterministic_compute=use_deterministic_compute,
+                intra_op_num_threads=intra_op_num_threads,
             )
 
         # phoneme -> phoneme, phoneme, ...
@@ -385,6 +408,7 @@ class Mimic3Voice(metaclass=ABCMeta):
             ]
         ] = None,
         use_deterministic_compute: bool = False,
+        intra_op_num_threads: typing.Optional[int] = None,
     ) -> onnxruntime.InferenceSession:
         _LOGGER.debug("Loading model from %s", generator_path)
 
@@ -400,6 +424,9 @@ class Mimic3Voice(metaclass=ABCMeta):
 
         session_options.use_deterministic_compute = use_deterministic_compute
 
+        if intra_op_num_threads is not None:
+            session_options.intra_op_num_threads = intra_op_num_threads
+
         onnx_model = onnxruntime.InferenceSession(
             str(generator_path), sess_options=session_options, providers=providers
         )
@@ -740,8 +767,9 @@ class EpitranVoice(Mimic3Voice):
         phoneme_str = epi.transliterate(text)
 
         if self.config.phonemes.break_phonemes_into_codepoints:
+            # to_codepoints already returns a new list
             all_word_phonemes = [
-                list(to_codepoints(wp_str)) for wp_str in phoneme_str.split()
+                to_codepoints(wp_str) for wp_str in phoneme_str.split()
             ]
         else:
             all_word_phonemes = [
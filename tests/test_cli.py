@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# Copyright 2022 Mycroft AI Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Tests for the mimic3 command-line interface.
+
+Synthesis is done by a fake remote server (--remote), so no voices are needed.
+"""
+import io
+import subprocess
+import sys
+import tempfile
+import threading
+import typing
+import wave
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+_REPO_DIR = Path(__file__).parent.parent
+
+
+def _silent_wav_bytes() -> bytes:
+    """Short WAV file returned for every synthesis request"""
+    with io.BytesIO() as wav_io:
+        wav_file: wave.Wave_write = wave.open(wav_io, "wb")
+        with wav_file:
+            wav_file.setframerate(22050)
+            wav_file.setsampwidth(2)
+            wav_file.setnchannels(1)
+            wav_file.writeframes(bytes(100))
+
+        return wav_io.getvalue()
+
+
+class _FakeTTSHandler(BaseHTTPRequestHandler):
+    """Answers /api/tts with silence and records the requested text/voice"""
+
+    requests: typing.List[typing.Tuple[str, str]] = []
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        text = self.rfile.read(int(self.headers["Content-Length"])).decode()
+        self.requests.append((self.path, text))
+
+        wav_bytes = _silent_wav_bytes()
+        self.send_response(200)
+        self.send_header("Content-Type", "audio/wav")
+        self.send_header("Content-Length", str(len(wav_bytes)))
+        self.end_headers()
+        self.wfile.write(wav_bytes)
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        pass
+
+
+def _run_cli(cli_args: typing.List[str], input_text: str):
+    """Run mimic3 against the fake remote server"""
+    _FakeTTSHandler.requests = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _FakeTTSHandler)
+    server_thread = threading.Thread(target=server.serve_forever, daemon=True)
+    server_thread.start()
+
+    try:
+        subprocess.run(
+            [
+                sys.executable,
+                "-m",
+                "mimic3_tts",
+                "--remote",
+                f"http://127.0.0.1:{server.server_port}",
+            ]
+            + cli_args,
+            input=input_text,
+            cwd=_REPO_DIR,
+            check=True,
+            universal_newlines=True,
+            timeout=60,
+        )
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_sentence_split_output_naming_id():
+    """--sentence-split keeps one WAV file per id and the line's voice"""
+    with tempfile.TemporaryDirectory() as output_dir:
+        _run_cli(
+            [
+                "--sentence-split",
+                "--output-naming",
+                "id",
+                "--output-dir",
+                output_dir,
+            ],
+            "line_1|First sentence. Second sentence.\nline_2|Third sentence.\n",
+        )
+
+        wav_names = sorted(p.name for p in Path(output_dir).glob("*.wav"))
+        assert wav_names == ["line_1.wav", "line_2.wav"]
+
+    assert sorted(text for _path, text in _FakeTTSHandler.requests) == [
+        "First sentence. Second sentence.",
+        "Third sentence.",
+    ]
+
+
+def test_sentence_split_csv_voice():
+    """Per-line voices are used when --sentence-split is given"""
+    with tempfile.TemporaryDirectory() as output_dir:
+        _run_cli(
+            [
+                "--sentence-split",
+                "--csv-voice",
+                "--output-dir",
+                output_dir,
+            ],
+            "line_1|en_US/test_voice|First sentence. Second sentence.\n",
+        )
+
+        assert (Path(output_dir) / "line_1.wav").is_file()
+
+    assert [path for path, _text in _FakeTTSHandler.requests] == [
+        "/api/tts?voice=en_US%2Ftest_voice"
+    ]